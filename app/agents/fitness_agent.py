@@ -4,6 +4,8 @@ Provides personalized workout plans and fitness coaching based on user profile.
 """
 import os
 import re
+import threading
+from typing import Optional
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from app.core.llm_provider import llm_provider
@@ -11,10 +13,53 @@ from app.core.logger import get_agent_logger
 
 logger = get_agent_logger()
 
+# Phrases that mean the user is asking about their saved workout plan (one compiled scan)
+_WORKOUT_PLAN_RE = re.compile(
+    r"workout plan|current plan|my plan|training plan|exercise plan|routine",
+    re.IGNORECASE
+)
+
+# Trainer prompts, built once; process_query picks one per call based on profile state
+PROFILE_PROMPT = PromptTemplate(
+    input_variables=["query", "user_name", "user_profile"],
+    template="""You are {user_name}'s personal trainer, LifeBuddy.
+
+Profile: {user_profile}
+
+User says: {query}
+
+Rules:
+- If greeting: Just greet back professionally and ask how you can help
+- If asking about exercises/safety: Give specific advice 
+- If asking for a workout plan: Then create one
+- If asking other questions: Answer directly
+- Keep responses concise
+- Don't create workout plans unless specifically requested
+
+Response:"""
+)
+
+NO_PROFILE_PROMPT = PromptTemplate(
+    input_variables=["query"],
+    template="""You are a personal trainer. The user has NO PROFILE yet.
+
+Say: "Hey! I'm your personal trainer. I need to create your profile first. Please tell me:
+- Your name and age
+- Your fitness goals (weight loss, muscle gain, etc.)
+- Any injuries or limitations
+- How many days per week you can work out
+
+This will help me create personalized workout plans for you!"
+
+User said: {query}"""
+)
+
 
 class FitnessAgent:
     """AI Personal Trainer - Provides personalized workout plans and fitness coaching."""
     
+    __slots__ = ("name", "description", "llm", "user_profile", "workout_plan_status")
+    
     def __init__(self):
         self.name = "AI Personal Trainer"
         self.description = "Personalized fitness coaching and workout planning"
@@ -161,49 +206,15 @@ class FitnessAgent:
         logger.info(f"Has profile: {has_profile}")
         logger.info(f"Workout plan status: {self.workout_plan_status}")
         
-        # Create the prompt with state information
-        if has_profile:
-            prompt = PromptTemplate(
-                input_variables=["query", "user_name", "user_profile"],
-                template="""You are {user_name}'s personal trainer, LifeBuddy.
-
-Profile: {user_profile}
-
-User says: {query}
-
-Rules:
-- If greeting: Just greet back professionally and ask how you can help
-- If asking about exercises/safety: Give specific advice 
-- If asking for a workout plan: Then create one
-- If asking other questions: Answer directly
-- Keep responses concise
-- Don't create workout plans unless specifically requested
-
-Response:"""
-            )
-        else:
-            prompt = PromptTemplate(
-                input_variables=["query"],
-                template="""You are a personal trainer. The user has NO PROFILE yet.
-
-Say: "Hey! I'm your personal trainer. I need to create your profile first. Please tell me:
-- Your name and age
-- Your fitness goals (weight loss, muscle gain, etc.)
-- Any injuries or limitations
-- How many days per week you can work out
-
-This will help me create personalized workout plans for you!"
-
-User said: {query}"""
-            )
+        # Pick the prompt for the current profile state
+        prompt = PROFILE_PROMPT if has_profile else NO_PROFILE_PROMPT
         
         # Create the chain
         chain = prompt | self.llm | StrOutputParser()
         
         try:
             # Check if user is asking about their workout plan
-            workout_plan_keywords = ["workout plan", "current plan", "my plan", "training plan", "exercise plan", "routine"]
-            asking_about_plan = any(keyword in query.lower() for keyword in workout_plan_keywords)
+            asking_about_plan = _WORKOUT_PLAN_RE.search(query) is not None
             
             # Get workout plan details if needed
             workout_plan_details = ""
@@ -233,5 +244,17 @@ User said: {query}"""
             return f"I'm having trouble processing your request right now. Please make sure your profile is set up in data/user_profile.md. Error: {str(e)}"
 
 
-# Global fitness agent instance
-fitness_agent = FitnessAgent() 
\ No newline at end of file
+# Shared fitness agent, built on first use so importing this module doesn't
+# construct an LLM client or read the profile from disk
+_fitness_agent: Optional[FitnessAgent] = None
+_fitness_agent_lock = threading.Lock()
+
+
+def get_fitness_agent() -> FitnessAgent:
+    """Return the shared FitnessAgent, creating it on first call."""
+    global _fitness_agent
+    if _fitness_agent is None:
+        with _fitness_agent_lock:
+            if _fitness_agent is None:
+                _fitness_agent = FitnessAgent()
+    return _fitness_agent
@@ -2,24 +2,136 @@
 LangGraph-based Health Agent System for LifeBuddy.
 Migrates existing router and agent functionality to a graph-based agentic approach.
 """
+import copy
+import re
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, TypedDict, Annotated, Literal, Optional
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-from langgraph.graph import StateGraph, END
+from typing import Dict, List, Any, TypedDict, Annotated, Literal, Optional, Tuple, AsyncIterator
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.sqlite import SqliteSaver
 
 from app.core.llm_provider import LLMProvider
-from app.core.health_tools import get_fitness_tools, get_general_tools
-from app.core.health_data_service import HealthDataService
-from app.agents.intent_classifier import IntentClassifier, HealthIntent
-from app.agents.fitness_agent import fitness_agent
+from app.core.health_tools import get_general_tools
+from app.core.health_data_service import get_health_service
+from app.agents.intent_classifier import IntentClassifier, HealthIntent, conversation_fingerprint
+from app.agents.fitness_agent import get_fitness_agent
 from app.core.logger import get_agent_logger
 
 # Initialize logger
 logger = get_agent_logger()
 
+# Seconds to reuse the user's timezone between turns
+TIMEZONE_CACHE_TTL = 60
+
+# Seconds a tool result is reused for the same (tool, input). Ingestion runs as a
+# separate process and can't clear this cache, so one short TTL bounds staleness
+# for every tool after a new Apple Health import
+TOOL_CACHE_TTL = 300
+TOOL_CACHE_MAX_ENTRIES = 256
+
+# Seconds a full chat answer is reused for an identical (normalized) message in the same session
+RESPONSE_CACHE_TTL = 300
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+
+# Questions about "now" depend on the clock, so their answers are never cached
+_TIME_RELATIVE_RE = re.compile(
+    r'\b(today|tonight|now|latest|current|currently|yesterday|this (?:morning|week|month))\b',
+    re.IGNORECASE
+)
+
+# Tool calls warmed in the background while the LLM picks a tool for a health turn
+PREFETCH_TOOL_CALLS = [
+    ("get_daily_steps", "7"),
+    ("get_heart_rate_summary", "7"),
+    ("get_sleep_data", "7"),
+]
+
+# Tool call rounds allowed per native tool-calling turn before giving up on an answer
+MAX_TOOL_ROUNDS = 3
+
+# Run tag marking LLM calls whose tokens are the user-facing answer (see chat_stream)
+FINAL_RESPONSE_TAG = "final_response"
+
+# Intent value -> analysis route; anything unlisted goes to fitness
+_INTENT_ROUTES = {
+    HealthIntent.FITNESS.value: "fitness",
+    HealthIntent.HEALTH.value: "health",
+}
+
+# Tool set per tool-using domain; only these factories run when tools are (re)built.
+# Fitness turns go through the profile-aware fitness agent and need no tools.
+DOMAIN_TOOL_FACTORIES = {
+    "health": get_general_tools,  # Apple Health data tools
+}
+
+# Parsers for the TOOL:/INPUT: tool selection format
+_TOOL_RE = re.compile(r'TOOL:\s*(\w+)')
+_INPUT_RE = re.compile(r'INPUT:\s*(\w+)')
+
+# Domain system prompts; kept free of per-user values so the prefix is byte-identical
+# across turns and users, which is what provider-side prompt caching keys on
+DOMAIN_SYSTEM_PROMPTS = {
+    "health": """You are LifeBuddy, an AI health data analyst. Help users analyze their Apple Health data:
+
+- Step counts and activity levels
+- Heart rate and fitness metrics  
+- Workout history and performance
+- Weight tracking and trends
+- Sleep and wellness patterns
+
+You have access to tools to get the user's actual health data. Use these tools to provide data-driven analysis and insights.
+
+Always speak directly to the user using "you" and "your" (not "the user").
+Keep responses analytical and informative based on their actual data."""
+}
+
+# Per-user context, appended after the static prompt so it never breaks the cached prefix
+TIMEZONE_CONTEXT = "User is in timezone: {timezone_name} ({timezone_offset})"
+
+# Single-step tool selection prompt - much simpler than ReAct
+TOOL_SELECTION_TEMPLATE = """{system_prompt}
+
+Available tools:
+{{tools_text}}
+
+Your task: Identify which tool to use and what input to provide.
+
+Respond with EXACTLY this format:
+TOOL: [tool_name]
+INPUT: [input_value]
+
+Examples:
+User: "show my heart rate"
+TOOL: get_heart_rate_summary  
+INPUT: 7
+
+User: "steps last 2 weeks"
+TOOL: get_daily_steps
+INPUT: 14
+
+User: "my sleep patterns"  
+TOOL: get_sleep_data
+INPUT: 7
+
+Be precise with the format. Use only tool names from the list above."""
+
+# Dynamic half of the response formatting system message, filled with str.format and
+# sent as a raw message; values are never re-parsed, so braces in tool output need no escaping
+RESPONSE_TEMPLATE = TIMEZONE_CONTEXT + """
+
+The user asked: {query}
+
+I retrieved this health data:
+{tool_result}
+
+Please provide a helpful, natural response to the user based on this data. Be friendly and conversational."""
+
 
 class HealthSessionState(TypedDict):
     """State schema for health conversation sessions."""
@@ -30,6 +142,7 @@ class HealthSessionState(TypedDict):
     # User context (loaded from persistent storage)
     user_timezone: Dict[str, str]
     session_id: str
+    fingerprint: str  # Content-derived key for caching, unlike the random session_id
     turn_count: int
     
     # Analysis context
@@ -44,27 +157,84 @@ class HealthSessionState(TypedDict):
 class HealthAgentGraph:
     """Main LangGraph-based health agent orchestrator."""
     
-    def __init__(self):
-        """Initialize the health agent graph."""
+    def __init__(self, provider: Optional[str] = None):
+        """Initialize the health agent graph, optionally for a specific LLM provider."""
         # Initialize LLM provider
-        self.llm_provider = LLMProvider()
+        self.llm_provider = LLMProvider(provider)
         self.llm = self.llm_provider.get_llm()
         
+        # Providers with native function calling skip the TOOL:/INPUT: prompt format
+        self.supports_tool_calling = self.llm_provider.supports_tool_calling
+        
         # Initialize other services
-        self.health_service = HealthDataService()
+        self.health_service = get_health_service()
         self.intent_classifier = IntentClassifier()
         
+        # (fetched_at, timezone_info) - timezone rarely changes within a session
+        self._tz_cache: Tuple[float, Optional[Dict[str, str]]] = (0.0, None)
+        
+        # LRU of recent tool outputs keyed by (tool_name, tool_input)
+        self._tool_cache: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._tool_cache_lock = threading.Lock()
+        # Tool calls currently running, so a prefetch and the selected tool share one query
+        self._tool_inflight: Dict[Tuple[str, str], Future] = {}
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-prefetch")
+        
+        # LRU of recent chat results keyed by (session_id, conversation fingerprint)
+        self._response_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        
         # Initialize health tools with LLM
         self._init_tools()
         
-        # Build the graph
+        # Compile prompt templates once instead of on every turn
+        self._init_prompts()
+        
+        # Build the graph. Each chat() turn starts from a fresh state, so no
+        # checkpointer is attached - it would only add per-step persistence cost
         self.compiled_graph = self._build_graph().compile()
     
     def _init_tools(self):
         """Initialize health tools with current LLM."""
-        # Use the existing tool functions that are already imported
-        self.fitness_tools = get_fitness_tools()
-        self.general_tools = get_general_tools()
+        domain_tools = {domain: factory() for domain, factory in DOMAIN_TOOL_FACTORIES.items()}
+        
+        # Per-domain lookup tables, built once instead of on every turn
+        self._tools_by_name = {
+            domain: {tool.name: tool for tool in tools} for domain, tools in domain_tools.items()
+        }
+        self._tools_text = {
+            domain: "\n".join(f"- {tool.name}: {tool.description}" for tool in tools)
+            for domain, tools in domain_tools.items()
+        }
+        
+        # Bind domain tools to the LLM when the provider supports native tool calling
+        self._tool_llms = {}
+        if self.supports_tool_calling:
+            for domain, tools in domain_tools.items():
+                self._tool_llms[domain] = self.llm.bind_tools(tools)
+    
+    def _init_prompts(self):
+        """Build the per-domain tool selection prompt templates."""
+        self._tool_select_prompts = {}
+        
+        for domain, system_prompt in DOMAIN_SYSTEM_PROMPTS.items():
+            self._tool_select_prompts[domain] = ChatPromptTemplate.from_messages([
+                ("system", TOOL_SELECTION_TEMPLATE.format(system_prompt=system_prompt) + "\n\n" + TIMEZONE_CONTEXT),
+                ("human", "{query}")
+            ]).partial(tools_text=self._tools_text[domain])
+    
+    def _system_message(self, static_text: str, dynamic_text: str) -> SystemMessage:
+        """Build a system message with a cacheable static prefix and a per-turn suffix.
+        
+        OpenAI and local servers (Ollama, vLLM) reuse a repeated prefix on their own;
+        Anthropic only caches up to an explicit cache_control breakpoint.
+        """
+        if self.llm_provider.provider == "anthropic":
+            return SystemMessage(content=[
+                {"type": "text", "text": static_text, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": dynamic_text}
+            ])
+        return SystemMessage(content=f"{static_text}\n\n{dynamic_text}")
     
     def update_llm(self, new_llm):
         """Update the LLM and rebuild tools and graph."""
@@ -72,6 +242,10 @@ class HealthAgentGraph:
         self._init_tools()
         # Note: We don't rebuild the compiled graph as it's expensive
         # The tools will use the new LLM instance
+        
+        # Answers from the previous LLM are no longer representative
+        with self._response_cache_lock:
+            self._response_cache.clear()
     
     def _build_graph(self) -> StateGraph:
         """Build the main health agent graph."""
@@ -80,19 +254,22 @@ class HealthAgentGraph:
         # Add nodes
         graph.add_node("load_context", self._load_session_context)
         graph.add_node("classify_intent", self._classify_intent_and_enrich)
+        graph.add_node("dispatch", self._dispatch)
         graph.add_node("fitness_analysis", self._fitness_analysis)
         graph.add_node("health_analysis", self._health_analysis)
         graph.add_node("generate_response", self._generate_response)
         
-        # Define the flow
-        graph.set_entry_point("load_context")
+        # Define the flow: context loading and intent classification are
+        # independent, so they run in parallel from the entry point
+        graph.add_edge(START, "load_context")
+        graph.add_edge(START, "classify_intent")
         
-        # Load context -> Intent classification
-        graph.add_edge("load_context", "classify_intent")
+        # Join both branches before routing
+        graph.add_edge(["load_context", "classify_intent"], "dispatch")
         
-        # Intent classification -> Specialized analysis (fitness-first)
+        # Dispatch -> Specialized analysis (fitness-first)
         graph.add_conditional_edges(
-            "classify_intent",
+            "dispatch",
             self._route_by_intent,
             {
                 "fitness": "fitness_analysis",
@@ -109,71 +286,81 @@ class HealthAgentGraph:
         
         return graph
     
-    def _load_session_context(self, state: HealthSessionState) -> HealthSessionState:
+    def _load_session_context(self, state: HealthSessionState) -> Dict[str, Any]:
         """Load user context and session information."""
+        # Parallel branch: return only the keys this node owns
+        updates: Dict[str, Any] = {}
+        
         # Generate session ID if not present
         if not state.get("session_id"):
-            state["session_id"] = str(uuid.uuid4())
+            updates["session_id"] = str(uuid.uuid4())
         
         # Load user timezone from health service (timezone-aware system)
         try:
-            timezone_info = self.health_service.get_user_timezone_info()
-            state["user_timezone"] = {
+            timezone_info = self._get_timezone_info()
+            updates["user_timezone"] = {
                 "name": timezone_info["timezone_name"],
                 "offset": timezone_info["timezone_offset"]
             }
         except Exception as e:
             logger.warning(f"Error loading timezone: {e}")
-            state["user_timezone"] = {"name": "UTC", "offset": "+0000"}
+            updates["user_timezone"] = {"name": "UTC", "offset": "+0000"}
         
         # Initialize session metadata
-        state["turn_count"] = state.get("turn_count", 0) + 1
-        state["health_data_cache"] = state.get("health_data_cache", {})
-        state["tools_used"] = []
+        updates["turn_count"] = state.get("turn_count", 0) + 1
+        updates["health_data_cache"] = state.get("health_data_cache", {})
+        updates["tools_used"] = []
         
-        return state
+        return updates
+    
+    def _get_timezone_info(self) -> Dict[str, str]:
+        """Get the user's timezone info, reusing a recent lookup when available."""
+        now = time.monotonic()
+        fetched_at, timezone_info = self._tz_cache
+        if timezone_info is None or now - fetched_at >= TIMEZONE_CACHE_TTL:
+            timezone_info = self.health_service.get_user_timezone_info()
+            self._tz_cache = (now, timezone_info)
+        return timezone_info
     
-    def _classify_intent_and_enrich(self, state: HealthSessionState) -> HealthSessionState:
+    def _classify_intent_and_enrich(self, state: HealthSessionState) -> Dict[str, Any]:
         """Classify user intent using existing intent classifier."""
         # Get the latest user message
         latest_message = state["messages"][-1] if state["messages"] else None
         if not latest_message or not isinstance(latest_message, HumanMessage):
-            state["current_intent"] = "general"
-            return state
+            return {"current_intent": "general"}
         
         # Use existing intent classifier
         try:
             intent = self.intent_classifier.classify(str(latest_message.content))
-            state["current_intent"] = intent.value
+            return {"current_intent": intent.value}
         except Exception as e:
             logger.warning(f"Intent classification error: {e}")
-            state["current_intent"] = "general"
-        
-        return state
+            return {"current_intent": "general"}
+    
+    def _dispatch(self, state: HealthSessionState) -> Dict[str, Any]:
+        """Join point for the context and intent branches; routing happens on its edges."""
+        return {}
     
     def _route_by_intent(self, state: HealthSessionState) -> Literal["fitness", "health"]:
         """Route to appropriate analysis based on intent (fitness-first)."""
-        intent = state["current_intent"]
-        if intent == "health":
-            return "health"
-        return "fitness"  # Default to fitness for everything else
+        return _INTENT_ROUTES.get(state["current_intent"], "fitness")  # Default to fitness for everything else
     
-    def _fitness_analysis(self, state: HealthSessionState) -> HealthSessionState:
+    def _fitness_analysis(self, state: HealthSessionState) -> Dict[str, Any]:
         """Execute fitness-focused analysis using the profile-aware fitness agent."""
-        from langchain_core.prompts import ChatPromptTemplate
-        
         latest_message = state["messages"][-1]
         user_query = str(latest_message.content)
         
         # Use the profile-aware fitness agent
         try:
+            fitness_agent = get_fitness_agent()
+            
             # Refresh profile to get latest data
             fitness_agent.refresh_profile()
             
             # Get response from the fitness agent
             response = fitness_agent.process_query(user_query)
             
-            state["current_analysis"] = {
+            analysis = {
                 "domain": "fitness",
                 "result": response,
                 "tools_used": ["fitness_agent"],
@@ -183,122 +370,76 @@ class HealthAgentGraph:
                     "tool_output": response
                 }]
             }
-            state["tools_used"] = ["fitness_agent"]
             
         except Exception as e:
             logger.warning(f"Fitness agent error: {e}")
             # Fallback to simple response
-            state["current_analysis"] = {
+            analysis = {
                 "domain": "fitness",
                 "result": "I'm having trouble accessing your fitness profile right now. Please make sure your user profile is filled out in data/user_profile.md for personalized recommendations.",
                 "tools_used": [],
                 "thinking_chain": []
             }
-            state["tools_used"] = []
         
-        return state
+        return {"current_analysis": analysis, "tools_used": analysis["tools_used"]}
     
-    def _health_analysis(self, state: HealthSessionState) -> HealthSessionState:
+    def _health_analysis(self, state: HealthSessionState) -> Dict[str, Any]:
         """Handle Apple Health data analysis using health tools."""
-        return self._execute_specialized_analysis(
-            state,
-            "health",
-            self.general_tools,  # These are the Apple Health data tools
-            """You are LifeBuddy, an AI health data analyst. Help users analyze their Apple Health data:
-
-- Step counts and activity levels
-- Heart rate and fitness metrics  
-- Workout history and performance
-- Weight tracking and trends
-- Sleep and wellness patterns
-
-User is in timezone: {timezone_name} ({timezone_offset})
-
-You have access to tools to get the user's actual health data. Use these tools to provide data-driven analysis and insights.
-
-Always speak directly to the user using "you" and "your" (not "the user").
-Keep responses analytical and informative based on their actual data."""
-        )
+        # Overlap the most common data lookups with the tool selection LLM call,
+        # unless they are all still cached from an earlier turn
+        if not all(self._tool_cached(key) for key in PREFETCH_TOOL_CALLS):
+            self._prefetch_executor.submit(self._prefetch_tools, "health")
+        return self._execute_specialized_analysis(state, "health")
+    
+    def _prefetch_tools(self, domain: str):
+        """Warm the tool cache with the usual 7-day lookups for a domain."""
+        for tool_name, tool_input in PREFETCH_TOOL_CALLS:
+            tool = self._tools_by_name[domain].get(tool_name)
+            if tool:
+                try:
+                    self._run_tool(tool, tool_input)
+                except Exception as e:
+                    logger.debug("Prefetch of %s failed: %s", tool_name, e)
     
-    def _execute_specialized_analysis(self, state: HealthSessionState, domain: str, tools: List, system_prompt_template: str) -> HealthSessionState:
+    def _execute_specialized_analysis(self, state: HealthSessionState, domain: str) -> Dict[str, Any]:
         """Execute specialized analysis using simple single-step tool prompting for small models."""
-        from langchain_core.prompts import ChatPromptTemplate
-        import re
-        import json
-        
-        # Format system prompt with timezone info
-        system_prompt = system_prompt_template.format(
-            timezone_name=state['user_timezone']['name'],
-            timezone_offset=state['user_timezone']['offset']
-        )
+        # Timezone info fills the per-turn suffix after the cached static prompt
+        prompt_vars = {
+            "timezone_name": state['user_timezone']['name'],
+            "timezone_offset": state['user_timezone']['offset']
+        }
         
         latest_message = state["messages"][-1]
         user_query = str(latest_message.content)
         
-        # Create available tools list for the prompt
-        tool_descriptions = []
-        for tool in tools:
-            tool_descriptions.append(f"- {tool.name}: {tool.description}")
-        tools_text = "\n".join(tool_descriptions)
-        
-        # Single-step tool selection prompt - much simpler than ReAct
-        tool_selection_prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""{system_prompt}
-
-Available tools:
-{tools_text}
-
-Your task: Identify which tool to use and what input to provide.
-
-Respond with EXACTLY this format:
-TOOL: [tool_name]
-INPUT: [input_value]
-
-Examples:
-User: "show my heart rate"
-TOOL: get_heart_rate_summary  
-INPUT: 7
-
-User: "steps last 2 weeks"
-TOOL: get_daily_steps
-INPUT: 14
-
-User: "my sleep patterns"  
-TOOL: get_sleep_data
-INPUT: 7
-
-Be precise with the format. Use only tool names from the list above."""),
-            ("human", "{query}")
-        ])
-        
         thinking_chain = []
         try:
+            # Native tool calling handles selection and the answer in one message thread
+            if domain in self._tool_llms:
+                return self._execute_native_tool_analysis(state, domain, user_query, prompt_vars)
+            
             # Step 1: Get tool selection from LLM
-            chain = tool_selection_prompt | self.llm
-            result = chain.invoke({"query": user_query})
+            chain = self._tool_select_prompts[domain] | self.llm
+            result = chain.invoke({"query": user_query, **prompt_vars})
             response_text = str(result.content) if hasattr(result, 'content') else str(result)
             
             # Debug: Log what LLM generated
             logger.info(f"LLM tool selection output: {response_text}")
             
             # Step 2: Parse the simple format
-            tool_match = re.search(r'TOOL:\s*(\w+)', response_text)
-            input_match = re.search(r'INPUT:\s*(\w+)', response_text)
+            tool_match = _TOOL_RE.search(response_text)
+            input_match = _INPUT_RE.search(response_text)
             
             if tool_match and input_match:
                 tool_name = tool_match.group(1)
                 tool_input = input_match.group(1)
                 
                 # Step 3: Find and execute the tool
-                selected_tool = None
-                for tool in tools:
-                    if tool.name == tool_name:
-                        selected_tool = tool
-                        break
+                selected_tool = self._tools_by_name[domain].get(tool_name)
                 
                 if selected_tool:
-                    # Execute the tool directly
-                    tool_result = selected_tool.func(tool_input)
+                    # Execute the tool directly (or reuse a fresh cached result)
+                    tool_result = self._run_tool(selected_tool, tool_input)
                     
                     # Record thinking chain
                     thinking_chain.append({
@@ -308,51 +449,42 @@ Be precise with the format. Use only tool names from the list above."""),
                     })
                     
                     # Step 4: Format response using LLM
-                    # Escape any curly braces in tool_result to avoid template variable issues
-                    escaped_tool_result = tool_result.replace("{", "{{").replace("}", "}}")
-                    
-                    response_prompt = ChatPromptTemplate.from_messages([
-                        ("system", f"""{system_prompt}
-
-The user asked: {user_query}
-
-I retrieved this health data:
-{escaped_tool_result}
-
-Please provide a helpful, natural response to the user based on this data. Be friendly and conversational."""),
-                        ("human", "Please analyze and explain this health data.")
-                    ])
-                    
-                    response_chain = response_prompt | self.llm
-                    final_response = response_chain.invoke({})
+                    response_messages = [
+                        self._system_message(
+                            DOMAIN_SYSTEM_PROMPTS[domain],
+                            RESPONSE_TEMPLATE.format(
+                                query=user_query,
+                                tool_result=tool_result,
+                                **prompt_vars
+                            )
+                        ),
+                        HumanMessage(content="Please analyze and explain this health data.")
+                    ]
+                    final_response = self.llm.invoke(response_messages, config={"tags": [FINAL_RESPONSE_TAG]})
                     final_text = str(final_response.content) if hasattr(final_response, 'content') else str(final_response)
                     
-                    state["current_analysis"] = {
+                    analysis = {
                         "domain": domain,
                         "result": final_text,
                         "tools_used": [tool_name],
                         "thinking_chain": thinking_chain
                     }
-                    state["tools_used"] = [tool_name]
-                    
                 else:
                     # Tool not found
-                    state["current_analysis"] = {
+                    analysis = {
                         "domain": domain,
                         "result": f"I tried to use '{tool_name}' but it's not available. Please try asking about steps, heart rate, workouts, or sleep data.",
                         "tools_used": [],
                         "thinking_chain": []
                     }
-                    state["tools_used"] = []
             else:
                 # Parsing failed - provide helpful guidance
-                state["current_analysis"] = {
+                analysis = {
                     "domain": domain,
                     "result": f"I'm having trouble understanding your {domain} question. Try asking something like 'show my heart rate' or 'get my steps for last week'.",
                     "tools_used": [],
                     "thinking_chain": []
                 }
-                state["tools_used"] = []
         
         except Exception as e:
             logger.warning(f"{domain.title()} analysis error: {e}")
@@ -372,33 +504,136 @@ Please provide a helpful, natural response to the user based on this data. Be fr
             else:
                 fallback_response += "Please try rephrasing your question or ask me about a specific health metric like steps, heart rate, or sleep."
             
-            state["current_analysis"] = {
+            analysis = {
                 "domain": domain,
                 "result": fallback_response,
                 "tools_used": [],
                 "thinking_chain": []
             }
-            state["tools_used"] = []
         
-        return state
+        return {"current_analysis": analysis, "tools_used": analysis["tools_used"]}
+    
+    def _tool_cached(self, key: Tuple[str, str]) -> bool:
+        """Whether a fresh result for (tool_name, tool_input) is in the tool cache."""
+        with self._tool_cache_lock:
+            cached = self._tool_cache.get(key)
+            return bool(cached) and time.monotonic() - cached[0] < TOOL_CACHE_TTL
     
-    def _generate_response(self, state: HealthSessionState) -> HealthSessionState:
+    def _run_tool(self, tool, tool_input: Any) -> Any:
+        """Execute a tool, reusing its result if the same call ran within TOOL_CACHE_TTL.
+        
+        A call that is already running (e.g. a prefetch) is waited on instead of
+        being issued a second time against the shared database connection.
+        """
+        key = (tool.name, str(tool_input))
+        
+        with self._tool_cache_lock:
+            cached = self._tool_cache.get(key)
+            if cached and time.monotonic() - cached[0] < TOOL_CACHE_TTL:
+                self._tool_cache.move_to_end(key)
+                return cached[1]
+            pending = self._tool_inflight.get(key)
+            if pending is None:
+                future: Future = Future()
+                self._tool_inflight[key] = future
+        
+        if pending is not None:
+            return pending.result()
+        
+        try:
+            tool_result = tool.func(tool_input)
+        except BaseException as e:
+            with self._tool_cache_lock:
+                del self._tool_inflight[key]
+            future.set_exception(e)
+            raise
+        
+        with self._tool_cache_lock:
+            del self._tool_inflight[key]
+            # Health tools report failures as "Error ..." strings; don't pin those
+            if not (isinstance(tool_result, str) and tool_result.startswith("Error")):
+                self._tool_cache[key] = (time.monotonic(), tool_result)
+                self._tool_cache.move_to_end(key)
+                if len(self._tool_cache) > TOOL_CACHE_MAX_ENTRIES:
+                    self._tool_cache.popitem(last=False)
+        
+        future.set_result(tool_result)
+        return tool_result
+    
+    def _execute_native_tool_analysis(self, state: HealthSessionState, domain: str,
+                                      user_query: str, prompt_vars: Dict[str, str]) -> Dict[str, Any]:
+        """Execute specialized analysis through the provider's native tool calling."""
+        tool_llm = self._tool_llms[domain]
+        messages = [
+            self._system_message(DOMAIN_SYSTEM_PROMPTS[domain], TIMEZONE_CONTEXT.format(**prompt_vars)),
+            HumanMessage(content=user_query)
+        ]
+        
+        # Step 1: The LLM either answers directly or emits tool calls. This call mostly
+        # selects tools, so it isn't tagged as the streamed answer
+        ai_message = tool_llm.invoke(messages)
+        
+        thinking_chain = []
+        tools_used = []
+        rounds = 0
+        while ai_message.tool_calls:
+            if rounds == MAX_TOOL_ROUNDS:
+                logger.warning(f"Stopped after {MAX_TOOL_ROUNDS} tool rounds without a final answer")
+                analysis = {
+                    "domain": domain,
+                    "result": "I gathered a lot of your data but couldn't pull it together into an answer. Please try asking about one metric at a time.",
+                    "tools_used": [],
+                    "thinking_chain": thinking_chain
+                }
+                return {"current_analysis": analysis, "tools_used": analysis["tools_used"]}
+            rounds += 1
+            messages.append(ai_message)
+            
+            # Step 2: Execute each requested tool and feed the results back
+            for tool_call in ai_message.tool_calls:
+                tool_name = tool_call["name"]
+                tool_input = next(iter(tool_call["args"].values()), "")
+                selected_tool = self._tools_by_name[domain].get(tool_name)
+                
+                if selected_tool:
+                    tool_result = self._run_tool(selected_tool, tool_input)
+                    tools_used.append(tool_name)
+                    thinking_chain.append({
+                        "tool_name": tool_name,
+                        "tool_input": tool_input,
+                        "tool_output": tool_result
+                    })
+                else:
+                    tool_result = f"Tool '{tool_name}' is not available."
+                
+                messages.append(ToolMessage(content=tool_result, tool_call_id=tool_call["id"]))
+            
+            # Step 3: Continue the same thread; the LLM answers or asks for more data
+            ai_message = tool_llm.invoke(messages, config={"tags": [FINAL_RESPONSE_TAG]})
+        
+        analysis = {
+            "domain": domain,
+            "result": str(ai_message.content),
+            "tools_used": tools_used,
+            "thinking_chain": thinking_chain
+        }
+        
+        return {"current_analysis": analysis, "tools_used": analysis["tools_used"]}
+    
+    def _generate_response(self, state: HealthSessionState) -> Dict[str, Any]:
         """Generate final response and add to messages."""
         analysis = state.get("current_analysis", {})
         response_text = analysis.get("result", "I couldn't process your request properly.")
         
-        # Add AI response to messages
-        state["messages"].append(AIMessage(content=response_text))
-        state["final_response"] = response_text
-        
-        return state
+        # The add_messages reducer appends the reply to the history
+        return {"messages": [AIMessage(content=response_text)], "final_response": response_text}
     
-    def chat(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
-        """Main chat interface for health conversations."""
-        # Create initial state
-        initial_state = {
+    def _initial_state(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Build the starting graph state for a single chat turn."""
+        return {
             "messages": [HumanMessage(content=message)],
             "session_id": session_id or str(uuid.uuid4()),
+            "fingerprint": conversation_fingerprint(message),
             "current_intent": "",
             "user_timezone": {},
             "turn_count": 0,
@@ -407,6 +642,22 @@ Please provide a helpful, natural response to the user based on this data. Be fr
             "health_data_cache": {},
             "final_response": ""
         }
+    
+    def chat(self, message: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Main chat interface for health conversations."""
+        # Create initial state
+        initial_state = self._initial_state(message, session_id)
+        cache_key = (initial_state["session_id"], initial_state["fingerprint"])
+        # Without a caller-supplied session the id is random, so nothing could hit
+        cacheable = session_id is not None and not _TIME_RELATIVE_RE.search(message)
+        
+        # Repeated questions in a session reuse a recent answer instead of re-running the graph
+        if cacheable:
+            with self._response_cache_lock:
+                cached = self._response_cache.get(cache_key)
+                if cached and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+                    self._response_cache.move_to_end(cache_key)
+                    return copy.deepcopy(cached[1])
         
         # Execute graph
         try:
@@ -415,12 +666,25 @@ Please provide a helpful, natural response to the user based on this data. Be fr
             current_analysis = result.get("current_analysis", {})
             thinking_chain = current_analysis.get("thinking_chain", [])
             
-            return {
+            response = {
                 "response": result["final_response"],
                 "thinking_chain": thinking_chain,
-                "intent": result.get("current_intent", "unknown")
+                "intent": result.get("current_intent", "unknown"),
+                "fingerprint": result.get("fingerprint", "")
             }
             
+            # Only cache answers backed by a tool; fallbacks should be retried, and
+            # fitness answers depend on the user profile, which can change at any time
+            if (cacheable and current_analysis.get("tools_used")
+                    and current_analysis.get("domain") != "fitness"):
+                with self._response_cache_lock:
+                    self._response_cache[cache_key] = (time.monotonic(), copy.deepcopy(response))
+                    self._response_cache.move_to_end(cache_key)
+                    if len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                        self._response_cache.popitem(last=False)
+            
+            return response
+            
         except Exception as e:
             logger.error(f"Graph execution error: {e}")
             return {
@@ -429,6 +693,34 @@ Please provide a helpful, natural response to the user based on this data. Be fr
                 "intent": "error"
             }
     
+    async def chat_stream(self, message: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the final response text as the LLM generates it."""
+        initial_state = self._initial_state(message, session_id)
+        streamed = False
+        final_state: Dict[str, Any] = {}
+        
+        try:
+            async for mode, payload in self.compiled_graph.astream(initial_state, stream_mode=["messages", "values"]):
+                if mode == "values":
+                    final_state = payload
+                    continue
+                
+                # Only forward tokens of answer-producing LLM calls (not intent or tool selection)
+                chunk, metadata = payload
+                is_answer = (FINAL_RESPONSE_TAG in metadata.get("tags", [])
+                             or metadata.get("langgraph_node") == "fitness_analysis")
+                if is_answer and isinstance(chunk.content, str) and chunk.content:
+                    streamed = True
+                    yield chunk.content
+        except Exception as e:
+            logger.error(f"Graph streaming error: {e}")
+            yield f"I encountered an error processing your request: {str(e)}"
+            return
+        
+        # Fallback answers never pass through an LLM, so emit them whole
+        if not streamed:
+            yield final_state.get("final_response", "")
+    
     def route_query(self, query: str, context: str = "") -> Dict[str, Any]:
         """Compatibility method for existing router interface."""
         session_id = str(uuid.uuid4())
@@ -445,5 +737,22 @@ Please provide a helpful, natural response to the user based on this data. Be fr
         }
 
 
-# Global instance for easy access (replaces old health_router)
-health_graph = HealthAgentGraph() 
\ No newline at end of file
+class _LazyHealthAgentGraph:
+    """Proxy that builds the shared HealthAgentGraph on first attribute access."""
+    
+    __slots__ = ()
+    
+    _instance: Optional[HealthAgentGraph] = None
+    _lock = threading.Lock()
+    
+    def __getattr__(self, name: str) -> Any:
+        if _LazyHealthAgentGraph._instance is None:
+            with _LazyHealthAgentGraph._lock:
+                if _LazyHealthAgentGraph._instance is None:
+                    _LazyHealthAgentGraph._instance = HealthAgentGraph()
+        return getattr(_LazyHealthAgentGraph._instance, name)
+
+
+# Global instance for easy access (replaces old health_router); built lazily so
+# importing this module doesn't construct the LLM, services and compiled graph
+health_graph = _LazyHealthAgentGraph() 
\ No newline at end of file
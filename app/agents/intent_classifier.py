@@ -1,12 +1,25 @@
 """
 Intent classifier for routing health queries to appropriate agents.
 """
+import hashlib
+import threading
+from collections import OrderedDict
 from enum import Enum
+from functools import cached_property
 from typing import Dict, Any
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from app.core.llm_provider import llm_provider
 
+# Recent classifications kept so repeated queries ("show my steps", "hi") skip the classifier
+INTENT_CACHE_MAX_ENTRIES = 1024
+
+
+def conversation_fingerprint(message: str, user_id: str = "default") -> str:
+    """Deterministic cache key for a message: blake2b over user id and normalized text."""
+    normalized = " ".join(message.lower().split())
+    return hashlib.blake2b(f"{user_id}|{normalized}".encode(), digest_size=16).hexdigest()
+
 
 class HealthIntent(Enum):
     """Health-related intents for routing queries."""
@@ -18,7 +31,6 @@ class IntentClassifier:
     """Classifies user queries into health intents."""
     
     def __init__(self):
-        self.llm = llm_provider.get_llm()
         self.prompt = PromptTemplate(
             input_variables=["query"],
             template="""Classify this query into ONE category:
@@ -35,20 +47,42 @@ Query: {query}
 
 Answer with just the category name (fitness/health):"""
         )
-        self.chain = self.prompt | self.llm | StrOutputParser()
+        
+        # LRU of query fingerprint -> intent
+        self._intent_cache: "OrderedDict[str, HealthIntent]" = OrderedDict()
+        self._intent_cache_lock = threading.Lock()
+    
+    @cached_property
+    def chain(self):
+        """LLM classification chain, built on first use rather than at construction."""
+        return self.prompt | llm_provider.get_llm() | StrOutputParser()
     
     def classify(self, query: str) -> HealthIntent:
-        """Classify a query into a health intent."""
-        result = self.chain.invoke({"query": query}).strip().lower()
+        """Classify a query into a health intent, reusing the result for repeated queries."""
+        key = conversation_fingerprint(query)
+        with self._intent_cache_lock:
+            intent = self._intent_cache.get(key)
+            if intent is not None:
+                self._intent_cache.move_to_end(key)
+                return intent
         
-        # Map result to enum
+        intent = self._classify(query)
+        
+        with self._intent_cache_lock:
+            self._intent_cache[key] = intent
+            if len(self._intent_cache) > INTENT_CACHE_MAX_ENTRIES:
+                self._intent_cache.popitem(last=False)
+        
+        return intent
+    
+    def _classify(self, query: str) -> HealthIntent:
+        """Run the LLM classification for a query."""
         intent_map = {
             "fitness": HealthIntent.FITNESS,
             "health": HealthIntent.HEALTH
         }
         
+        result = self.chain.invoke({"query": query}).strip().lower()
+        
+        # Map result to enum
         return intent_map.get(result, HealthIntent.FITNESS)
-
-
-# Global classifier instance
-intent_classifier = IntentClassifier() 
\ No newline at end of file
@@ -2,20 +2,21 @@
 FastAPI backend for LifeBuddy health analytics platform.
 Provides REST API endpoints and WebSocket chat interface.
 """
-import os
-import json
+import asyncio
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from contextlib import asynccontextmanager
 
+import orjson
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
-from app.core.health_data_service import HealthDataService
+from app.core.health_data_service import HealthDataService, get_health_service as get_shared_health_service
 from app.agents.health_graph import HealthAgentGraph
-from app.core.llm_provider import LLMProvider
 from app.core.logger import get_api_logger
 
 # Initialize logger
@@ -37,6 +38,17 @@ class ChatMessage(BaseModel):
     model: Optional[str] = Field(None, description="Specific model to use (e.g., gpt-4o, claude-3-sonnet-20240229)")
 
 
+class WSMessage(BaseModel):
+    """Incoming WebSocket chat frame."""
+    message: str = Field("", description="User message to the health agent")
+    session_id: Optional[str] = Field(None, description="Optional session ID for conversation continuity")
+    provider: Optional[str] = Field(None, description="LLM provider to use (ollama, openai, anthropic, google, azure)")
+
+
+# Parses and validates raw WebSocket frames in one pydantic-core pass
+WS_MESSAGE_ADAPTER = TypeAdapter(WSMessage)
+
+
 class ChatResponse(BaseModel):
     """Response model for chat messages."""
     response: str = Field(..., description="Agent response")
@@ -46,10 +58,17 @@ class ChatResponse(BaseModel):
     intent: Optional[str] = Field(None, description="Classified user intent")
 
 
-class HealthMetricsResponse(BaseModel):
-    """Response model for health metrics."""
-    data: Dict[str, Any] = Field(..., description="Health metrics data")
-    query_info: Dict[str, Any] = Field(..., description="Query metadata")
+# (epoch second, ISO string) - responses within the same second share one timestamp
+_iso_cache = (0, "")
+
+
+def _now_iso() -> str:
+    """Current local time in ISO format at one-second resolution, formatted once per second."""
+    global _iso_cache
+    now = int(time.time())
+    if now != _iso_cache[0]:
+        _iso_cache = (now, datetime.fromtimestamp(now).isoformat())
+    return _iso_cache[1]
 
 
 # Global instances
@@ -64,9 +83,9 @@ async def lifespan(app: FastAPI):
     
     logger.info("Starting LifeBuddy FastAPI backend...")
     
-    # Initialize health data service
+    # Initialize health data service (the same instance the agents' tools use)
     try:
-        health_service = HealthDataService()
+        health_service = get_shared_health_service()
         logger.info("Health data service initialized")
     except Exception as e:
         logger.error(f"Failed to initialize health data service: {e}")
@@ -92,7 +111,9 @@ app = FastAPI(
     title="LifeBuddy API",
     description="AI-powered personal health and wellness companion API",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # Plain dict responses are encoded with orjson; /health/* skip Pydantic response models
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware for frontend integration
@@ -100,8 +121,9 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8501", "http://127.0.0.1:8501"],  # Streamlit default ports
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # Let browsers cache preflight results for a day
 )
 
 
@@ -120,7 +142,29 @@ def get_health_agent() -> HealthAgentGraph:
     return health_agent
 
 
-# Health endpoints
+# Agents for explicitly requested providers, built once and reused across requests
+_agent_pool: Dict[str, HealthAgentGraph] = {}
+_agent_pool_lock = threading.Lock()
+
+
+def get_agent_for_provider(provider: str) -> HealthAgentGraph:
+    """Get the pooled health agent for an LLM provider, building it on first use."""
+    agent = _agent_pool.get(provider)
+    if agent is not None:
+        return agent
+    
+    with _agent_pool_lock:
+        agent = _agent_pool.get(provider)
+        if agent is None:
+            agent = HealthAgentGraph(provider=provider)
+            _agent_pool[provider] = agent
+            logger.info(f"Health agent initialized for provider: {provider}")
+    
+    return agent
+
+
+# Health endpoints. Service queries wait on the shared SQLite connection's lock,
+# which chat and prefetch threads also hold, so they run off the event loop.
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -142,128 +186,133 @@ async def health_status():
     try:
         # Test database connection
         service = get_health_service()
-        user_tz = service._get_user_timezone()
+        user_tz = await asyncio.to_thread(service._get_user_timezone)
         
         return {
             "status": "healthy",
             "database": "connected",
             "timezone": user_tz,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
 
+# Static provider list, serialized once at import
+PROVIDERS_RESPONSE = {
+    "providers": [
+        {"name": "ollama", "display": "Ollama (Local)", "default": True},
+        {"name": "openai", "display": "OpenAI GPT", "default": False},
+        {"name": "anthropic", "display": "Anthropic Claude", "default": False},
+        {"name": "google", "display": "Google Gemini", "default": False},
+        {"name": "azure", "display": "Azure OpenAI", "default": False}
+    ]
+}
+_PROVIDERS_JSON = orjson.dumps(PROVIDERS_RESPONSE)
+
+
 @app.get("/providers")
 async def get_available_providers():
     """Get list of available LLM providers."""
-    return {
-        "providers": [
-            {"name": "ollama", "display": "Ollama (Local)", "default": True},
-            {"name": "openai", "display": "OpenAI GPT", "default": False},
-            {"name": "anthropic", "display": "Anthropic Claude", "default": False},
-            {"name": "google", "display": "Google Gemini", "default": False},
-            {"name": "azure", "display": "Azure OpenAI", "default": False}
-        ]
-    }
+    return Response(content=_PROVIDERS_JSON, media_type="application/json")
 
 
-@app.get("/health/steps", response_model=HealthMetricsResponse)
+@app.get("/health/steps")
 async def get_steps(
     days_back: int = 7,
     service: HealthDataService = Depends(get_health_service)
 ):
     """Get daily step counts."""
     try:
-        data = service.get_daily_steps(days_back)
-        return HealthMetricsResponse(
-            data=data,
-            query_info={
+        data = await asyncio.to_thread(service.get_daily_steps, days_back)
+        return {
+            "data": data,
+            "query_info": {
                 "metric_type": "steps",
                 "days_back": days_back,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-        )
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/health/heart-rate", response_model=HealthMetricsResponse)
+@app.get("/health/heart-rate")
 async def get_heart_rate(
     days_back: int = 7,
     service: HealthDataService = Depends(get_health_service)
 ):
     """Get heart rate summary."""
     try:
-        data = service.get_heart_rate_summary(days_back)
-        return HealthMetricsResponse(
-            data=data,
-            query_info={
+        data = await asyncio.to_thread(service.get_heart_rate_summary, days_back)
+        return {
+            "data": data,
+            "query_info": {
                 "metric_type": "heart_rate",
                 "days_back": days_back,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-        )
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/health/workouts", response_model=HealthMetricsResponse)
+@app.get("/health/workouts")
 async def get_workouts(
     limit: int = 10,
     service: HealthDataService = Depends(get_health_service)
 ):
     """Get recent workouts."""
     try:
-        data = service.get_recent_workouts(limit)
-        return HealthMetricsResponse(
-            data=data,
-            query_info={
+        data = await asyncio.to_thread(service.get_recent_workouts, limit)
+        return {
+            "data": data,
+            "query_info": {
                 "metric_type": "workouts",
                 "limit": limit,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-        )
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/health/weight", response_model=HealthMetricsResponse)
+@app.get("/health/weight")
 async def get_weight(
     days_back: int = 30,
     service: HealthDataService = Depends(get_health_service)
 ):
     """Get weight progress."""
     try:
-        data = service.get_weight_progress(days_back)
-        return HealthMetricsResponse(
-            data=data,
-            query_info={
+        data = await asyncio.to_thread(service.get_weight_progress, days_back)
+        return {
+            "data": data,
+            "query_info": {
                 "metric_type": "weight",
                 "days_back": days_back,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-        )
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/health/search", response_model=HealthMetricsResponse)
+@app.post("/health/search")
 async def search_health_data(
     query: HealthQuery,
     service: HealthDataService = Depends(get_health_service)
 ):
     """Search for specific health data."""
     try:
-        data = service.search_health_data(query.metric_type, query.days_back)
-        return HealthMetricsResponse(
-            data=data,
-            query_info={
+        data = await asyncio.to_thread(service.search_health_data, query.metric_type, query.days_back)
+        return {
+            "data": data,
+            "query_info": {
                 "metric_type": query.metric_type,
                 "days_back": query.days_back,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
-        )
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -276,45 +325,21 @@ async def chat_message(
 ):
     """Send a message to the health agent."""
     try:
+        # Echoed back to the client only; the agent gets the caller's id (or None), so
+        # requests without one never share its per-session response cache
         session_id = chat_request.session_id or "default"
         
-        # Handle dynamic provider switching
+        # Handle dynamic provider switching with a pooled agent for that provider;
+        # otherwise use the default agent (Ollama from Docker environment)
         if chat_request.provider:
-            # Create a new agent instance with the requested provider
-            import os
-            
-            # Temporarily override the environment variable
-            original_provider = os.getenv("LLM_PROVIDER")
-            os.environ["LLM_PROVIDER"] = chat_request.provider
-            
-            try:
-                # Create new LLM provider and agent with the requested provider
-                dynamic_llm_provider = LLMProvider()
-                dynamic_llm = dynamic_llm_provider.get_llm()
-                
-                # Create a new agent instance with the dynamic LLM
-                from app.agents.health_graph import HealthAgentGraph
-                dynamic_agent = HealthAgentGraph()
-                dynamic_agent.update_llm(dynamic_llm)  # Use the update method
-                
-                # Use the dynamic agent for this request
-                agent_result = dynamic_agent.chat(
-                    message=chat_request.message,
-                    session_id=session_id
-                )
-                
-            finally:
-                # Restore original provider
-                if original_provider:
-                    os.environ["LLM_PROVIDER"] = original_provider
-                else:
-                    os.environ.pop("LLM_PROVIDER", None)
-        else:
-            # Use default agent (Ollama from Docker environment)
-            agent_result = agent.chat(
-                message=chat_request.message,
-                session_id=session_id
-            )
+            agent = await asyncio.to_thread(get_agent_for_provider, chat_request.provider)
+        
+        # The graph run is synchronous; keep it off the event loop
+        agent_result = await asyncio.to_thread(
+            agent.chat,
+            message=chat_request.message,
+            session_id=chat_request.session_id
+        )
         
         # Handle both old string format and new dict format for backwards compatibility
         if isinstance(agent_result, dict):
@@ -336,22 +361,40 @@ async def chat_message(
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@app.post("/chat/stream")
+async def chat_message_stream(
+    chat_request: ChatMessage,
+    agent: HealthAgentGraph = Depends(get_health_agent)
+):
+    """Stream the health agent's response as plain text chunks."""
+    session_id = chat_request.session_id or "default"
+    
+    # Same provider handling as /chat
+    if chat_request.provider:
+        agent = await asyncio.to_thread(get_agent_for_provider, chat_request.provider)
+    
+    return StreamingResponse(
+        agent.chat_stream(chat_request.message, session_id),
+        media_type="text/plain"
+    )
+
+
 # WebSocket for real-time chat
 class ConnectionManager:
     """Manages WebSocket connections."""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
     
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
     
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+    async def send_personal_bytes(self, payload: bytes, websocket: WebSocket):
+        await websocket.send_bytes(payload)
 
 
 manager = ConnectionManager()
@@ -367,15 +410,22 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            try:
+                ws_message = WS_MESSAGE_ADAPTER.validate_json(data)
+            except ValidationError as e:
+                await manager.send_personal_bytes(
+                    orjson.dumps({"error": f"Invalid message: {e.errors()[0]['msg']}"}),
+                    websocket
+                )
+                continue
             
-            user_message = message_data.get("message", "")
-            session_id = message_data.get("session_id", session_id)
-            provider = message_data.get("provider")  # Add provider support
+            user_message = ws_message.message
+            session_id = ws_message.session_id or session_id
+            provider = ws_message.provider
             
             if not user_message:
-                await manager.send_personal_message(
-                    json.dumps({"error": "Empty message"}), 
+                await manager.send_personal_bytes(
+                    orjson.dumps({"error": "Empty message"}),
                     websocket
                 )
                 continue
@@ -384,29 +434,11 @@ async def websocket_endpoint(websocket: WebSocket):
             try:
                 # Handle dynamic provider switching (same logic as HTTP endpoint)
                 if provider:
-                    import os
-                    original_provider = os.getenv("LLM_PROVIDER")
-                    os.environ["LLM_PROVIDER"] = provider
-                    
-                    try:
-                        dynamic_llm_provider = LLMProvider()
-                        dynamic_llm = dynamic_llm_provider.get_llm()
-                        
-                        from app.agents.health_graph import HealthAgentGraph
-                        dynamic_agent = HealthAgentGraph()
-                        dynamic_agent.update_llm(dynamic_llm)
-                        
-                        agent_result = dynamic_agent.chat(user_message, session_id)
-                        
-                    finally:
-                        if original_provider:
-                            os.environ["LLM_PROVIDER"] = original_provider
-                        else:
-                            os.environ.pop("LLM_PROVIDER", None)
+                    agent = await asyncio.to_thread(get_agent_for_provider, provider)
                 else:
                     # Use default agent
                     agent = get_health_agent()
-                    agent_result = agent.chat(user_message, session_id)
+                agent_result = await asyncio.to_thread(agent.chat, user_message, session_id)
                 
                 # Handle both old string format and new dict format
                 if isinstance(agent_result, dict):
@@ -423,23 +455,23 @@ async def websocket_endpoint(websocket: WebSocket):
                 response_data = {
                     "response": response_text,
                     "session_id": session_id,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": _now_iso(),
                     "thinking_chain": thinking_chain,
                     "intent": intent
                 }
                 
-                await manager.send_personal_message(
-                    json.dumps(response_data), 
+                await manager.send_personal_bytes(
+                    orjson.dumps(response_data),
                     websocket
                 )
                 
             except Exception as e:
                 error_response = {
                     "error": f"Processing error: {str(e)}",
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": _now_iso()
                 }
-                await manager.send_personal_message(
-                    json.dumps(error_response), 
+                await manager.send_personal_bytes(
+                    orjson.dumps(error_response),
                     websocket
                 )
                 
@@ -3,11 +3,14 @@ Health Data Service for accessing SQLite health database.
 Provides structured access to health metrics for LangChain agents.
 Now includes timezone-aware operations.
 """
+import atexit
+import functools
 import os
 import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta, date, timezone
-from typing import Dict, List, Optional, Any
-import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional
 import re
 
 from app.core.logger import get_logger
@@ -15,39 +18,259 @@ from app.core.logger import get_logger
 # Initialize logger
 logger = get_logger(__name__)
 
+# Seconds a metric result is reused for the same method and arguments; agents often
+# ask for the same metric several times within one conversation
+METRIC_CACHE_TTL = 60
+METRIC_CACHE_MAX_ENTRIES = 256
+
+# Longest period a metric query may cover (about ten years); days_back comes from
+# LLM tool input, so larger values are capped rather than scanned
+MAX_DAYS_BACK = 3650
+
+# Rows fetched per lock acquisition when streaming a query's results
+STREAM_BATCH_SIZE = 256
+
+# Per-connection tuning for this read-heavy service: relaxed fsync, in-memory temp
+# tables, 256MB memory-mapped I/O and a 64MB page cache
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# Indexes the metric queries rely on (same names as ingestion creates); ensured at
+# startup so databases built before an index was added still get range seeks
+REQUIRED_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_daily_summaries_date ON daily_summaries(date)",
+    "CREATE INDEX IF NOT EXISTS idx_workouts_date ON workouts(start_date)",
+    "CREATE INDEX IF NOT EXISTS idx_sleep_records_date ON sleep_records(start_date)",
+)
+
+# UTC offset format accepted in the TZ environment variable (UTC-8, UTC+5:30, etc.)
+_TZ_ENV_RE = re.compile(r'UTC([+-])(\d{1,2})(?::(\d{2}))?')
+
+# SQL is kept in module constants so every call passes the identical string and
+# hits the connection's compiled-statement cache instead of re-parsing
+TIMEZONE_QUERY = "SELECT timezone_name, timezone_offset FROM user_settings WHERE id = 1"
+
+STEPS_QUERY = """
+SELECT date, steps
+FROM daily_summaries 
+WHERE date >= ? AND date <= ? AND steps IS NOT NULL
+ORDER BY date DESC
+"""
+
+HEART_RATE_QUERY = """
+SELECT date, avg_heart_rate, min_heart_rate, max_heart_rate
+FROM daily_summaries 
+WHERE date >= ? AND date <= ? AND avg_heart_rate IS NOT NULL
+ORDER BY date DESC
+"""
+
+RECENT_WORKOUTS_QUERY = """
+SELECT workout_type, start_date, duration_minutes, 
+       total_energy_burned, total_distance_km
+FROM workouts 
+ORDER BY start_date DESC 
+LIMIT ?
+"""
+
+RECENT_WORKOUTS_TOTALS_QUERY = """
+SELECT COUNT(*) AS total_workouts,
+       COALESCE(SUM(total_energy_burned), 0) AS total_energy_burned,
+       COALESCE(SUM(duration_minutes), 0) AS total_duration_minutes,
+       COALESCE(SUM(total_distance_km), 0) AS total_distance_km
+FROM (
+    SELECT total_energy_burned, duration_minutes, total_distance_km
+    FROM workouts
+    ORDER BY start_date DESC
+    LIMIT ?
+)
+"""
+
+WEIGHT_QUERY = """
+SELECT date, body_mass_kg, body_fat_percentage
+FROM daily_summaries 
+WHERE date >= ? AND date <= ? AND body_mass_kg IS NOT NULL
+ORDER BY date DESC
+"""
+
+ACTIVITY_QUERY = """
+SELECT date, steps, active_energy_burned, 
+       exercise_time_minutes, distance_walking_km
+FROM daily_summaries 
+WHERE date >= ? AND date <= ?
+ORDER BY date DESC
+"""
+
+# Totals for every daily_summaries metric in one pass. The single-metric methods and
+# get_all_daily_metrics() all read their aggregates from this query, so each total
+# is defined once. Heart rate extremes only count days with an average, as the
+# heart rate breakdown does.
+DAILY_TOTALS_QUERY = """
+SELECT COALESCE(SUM(steps), 0) AS total_steps,
+       COUNT(steps) AS step_days,
+       AVG(avg_heart_rate) AS average_heart_rate,
+       MIN(CASE WHEN avg_heart_rate IS NOT NULL THEN min_heart_rate END) AS lowest_heart_rate,
+       MAX(CASE WHEN avg_heart_rate IS NOT NULL THEN max_heart_rate END) AS highest_heart_rate,
+       COUNT(avg_heart_rate) AS heart_rate_days,
+       COALESCE(SUM(active_energy_burned), 0) AS total_energy,
+       COALESCE(SUM(exercise_time_minutes), 0) AS total_exercise_time,
+       COALESCE(SUM(distance_walking_km), 0) AS total_distance,
+       COUNT(*) AS days_count
+FROM daily_summaries
+WHERE date >= ? AND date <= ?
+"""
+
+DAILY_METRICS_QUERY = """
+SELECT date, steps, avg_heart_rate, min_heart_rate, max_heart_rate,
+       body_mass_kg, body_fat_percentage, active_energy_burned,
+       exercise_time_minutes, distance_walking_km
+FROM daily_summaries
+WHERE date >= ? AND date <= ?
+ORDER BY date DESC
+"""
+
+SLEEP_QUERY = """
+SELECT 
+    substr(start_date, 1, 10) as sleep_date,
+    data_type,
+    sleep_stage,
+    source_name,
+    SUM(value) as duration_hours,
+    MIN(start_date) as first_start,
+    COUNT(*) as record_count
+FROM sleep_records 
+WHERE start_date >= ? AND start_date < ?
+GROUP BY sleep_date, data_type, sleep_stage, source_name
+"""
+
+
+def _ttl_cached(method):
+    """Reuse a metric method's result per (method, arguments) for METRIC_CACHE_TTL seconds."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with self._metric_cache_lock:
+            cached = self._metric_cache.get(key)
+            if cached and now - cached[0] < METRIC_CACHE_TTL:
+                return cached[1]
+        
+        result = method(self, *args, **kwargs)
+        
+        with self._metric_cache_lock:
+            if len(self._metric_cache) >= METRIC_CACHE_MAX_ENTRIES:
+                self._metric_cache.clear()
+            self._metric_cache[key] = (now, result)
+        return result
+    return wrapper
+
+
+def _bounded_days_back(method):
+    """Reject negative periods and cap long ones before the cache or database is used."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if args:
+            days_back, args = args[0], args[1:]
+        elif 'days_back' in kwargs:
+            days_back = kwargs.pop('days_back')
+        else:
+            return method(self, *args, **kwargs)
+        
+        if days_back < 0:
+            return {"message": "Invalid period"}
+        return method(self, min(days_back, MAX_DAYS_BACK), *args, **kwargs)
+    return wrapper
+
 
 class HealthDataService:
     """Service for accessing health data from SQLite database with timezone awareness."""
     
     def __init__(self, db_path: str | None = None):
         self.db_path = db_path or os.getenv("DATABASE_PATH", "data/lifebuddy.db")
-        self._verify_database()
-        self.user_timezone = self._get_user_timezone()
-    
-    def _verify_database(self):
-        """Verify database exists and has expected tables."""
+        
+        # Checked before connecting, since sqlite3.connect would create an empty file
         if not os.path.exists(self.db_path):
             raise FileNotFoundError(f"Health database not found: {self.db_path}")
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            expected_tables = ['health_records', 'daily_summaries', 'workouts', 'user_settings', 'sleep_records']
-            missing_tables = [t for t in expected_tables if t not in tables]
-            
-            if missing_tables:
-                raise ValueError(f"Missing database tables: {missing_tables}")
+        # One connection for the service's lifetime instead of one per query; the
+        # service is shared across API worker threads, so access is serialized.
+        # Startup (verification, index creation, timezone lookup) reuses it too.
+        self._conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None, cached_statements=128
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        
+        try:
+            self._verify_database(self._conn)
+        except Exception:
+            self._conn.close()
+            raise
+        
+        atexit.register(self._conn.close)
+        self._configure_connection()
+        
+        # (method, args, kwargs) -> (fetched_at, result), see _ttl_cached
+        self._metric_cache: Dict[tuple, tuple] = {}
+        self._metric_cache_lock = threading.Lock()
+        
+        self.user_timezone = self._get_user_timezone(self._conn)
+        self._user_tz = self._parse_offset(self.user_timezone['offset'])
+        
+        # (expires_at, date) for _get_user_current_date; expires at the user's midnight
+        self._today_cache: Optional[tuple] = None
+    
+    def _verify_database(self, conn: sqlite3.Connection):
+        """Verify database has expected tables and create the indexes queries use."""
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        
+        expected_tables = ['health_records', 'daily_summaries', 'workouts', 'user_settings', 'sleep_records']
+        missing_tables = [t for t in expected_tables if t not in tables]
+        
+        if missing_tables:
+            raise ValueError(f"Missing database tables: {missing_tables}")
+        
+        # All indexes in one transaction; this runs before query_only is switched on
+        try:
+            conn.execute("BEGIN")
+            for index_sql in REQUIRED_INDEXES:
+                conn.execute(index_sql)
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.warning(f"Could not create database indexes: {e}")
     
-    def _get_user_timezone(self) -> Dict[str, str]:
-        """Get user's timezone information, prioritizing current TZ environment variable."""
+    def _configure_connection(self):
+        """Apply read-optimized PRAGMAs to the service connection."""
+        # WAL lets ingestion write while agents read; it is persisted in the database
+        # file and needs write access, so a read-only database keeps its journal mode
+        try:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not enable WAL journal mode: {e}")
+        
+        for pragma in CONNECTION_PRAGMAS:
+            self._conn.execute(pragma)
+        
+        # The service only reads health data
+        self._conn.execute("PRAGMA query_only=1")
+    
+    def _get_user_timezone(self, conn: Optional[sqlite3.Connection] = None) -> Dict[str, str]:
+        """Get user's timezone information, prioritizing current TZ environment variable.
+        
+        During startup the open connection is passed in directly; later callers go
+        through the service connection and its lock.
+        """
         # First, check for current TZ environment variable (takes priority)
         tz_env = os.environ.get('TZ', '').strip()
         
         if tz_env and tz_env.startswith('UTC'):
             # Parse UTC offset format (UTC-8, UTC+5:30, etc.)
-            match = re.match(r'UTC([+-])(\d{1,2})(?::(\d{2}))?', tz_env)
+            match = _TZ_ENV_RE.match(tz_env)
             if match:
                 sign = match.group(1)
                 hours = int(match.group(2))
@@ -75,17 +298,18 @@ class HealthDataService:
         
         # Fallback to database timezone (from when data was parsed)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT timezone_name, timezone_offset FROM user_settings WHERE id = 1")
-                result = cursor.fetchone()
-                
-                if result:
-                    logger.info(f"Using timezone from database: {result[0]} ({result[1]})")
-                    return {
-                        'name': result[0],
-                        'offset': result[1]
-                    }
+            if conn is not None:
+                result = conn.execute(TIMEZONE_QUERY).fetchone()
+            else:
+                with self._lock:
+                    result = self._conn.execute(TIMEZONE_QUERY).fetchone()
+            
+            if result:
+                logger.info(f"Using timezone from database: {result[0]} ({result[1]})")
+                return {
+                    'name': result[0],
+                    'offset': result[1]
+                }
         except Exception as e:
             logger.warning(f"Error getting timezone from database: {e}")
         
@@ -108,223 +332,276 @@ class HealthDataService:
             "message": f"User is in timezone: {self.user_timezone['name']} ({self.user_timezone['offset']})"
         }
     
-    def _get_user_current_date(self) -> date:
-        """Get current date in user's timezone for accurate date range calculations."""
+    @staticmethod
+    def _parse_offset(offset_str: str) -> Optional[timezone]:
+        """Parse a "+0530" / "-0800" offset into a timezone; None if it can't be parsed."""
         try:
-            # Try to parse user timezone offset (e.g., "-0800" or "+0530")
-            offset_str = self.user_timezone['offset']
-            
-            # Parse offset string like "+0530" or "-0800"
             if len(offset_str) == 5 and offset_str[0] in ['+', '-']:
                 sign = 1 if offset_str[0] == '+' else -1
                 hours = int(offset_str[1:3])
                 minutes = int(offset_str[3:5])
-                total_minutes = sign * (hours * 60 + minutes)
-                
-                # Create timezone-aware datetime
-                user_tz = timezone(timedelta(minutes=total_minutes))
-                user_now = datetime.now(user_tz)
-                return user_now.date()
-            else:
-                # Fallback to system date if can't parse offset
-                logger.warning(f"Could not parse timezone offset: {offset_str}, using system date")
-                return datetime.now().date()
-                
+                return timezone(timedelta(minutes=sign * (hours * 60 + minutes)))
+            
+            logger.warning(f"Could not parse timezone offset: {offset_str}, using system date")
         except Exception as e:
-            logger.warning(f"Error calculating user timezone date: {e}, using system date")
-            return datetime.now().date()
+            logger.warning(f"Error parsing timezone offset {offset_str!r}: {e}, using system date")
+        return None
     
-    def _execute_query(self, query: str, params: tuple = ()) -> List[Dict]:
-        """Execute SQL query and return results as list of dictionaries."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+    def _get_user_current_date(self) -> date:
+        """Get current date in user's timezone for accurate date range calculations."""
+        # The date only changes at midnight, so reuse it until the next one
+        cached = self._today_cache
+        if cached is not None and time.time() < cached[0]:
+            return cached[1]
+        
+        # The offset is parsed once at startup; fall back to the system timezone without it
+        if self._user_tz is None:
+            now = datetime.now().astimezone()
+        else:
+            now = datetime.now(self._user_tz)
+        
+        today = now.date()
+        next_midnight = datetime.combine(today + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        self._today_cache = (next_midnight.timestamp(), today)
+        return today
     
-    def get_daily_steps(self, days_back: int = 7) -> Dict[str, Any]:
-        """Get daily step counts for the last N days."""
-        end_date = self._get_user_current_date()
-        start_date = end_date - timedelta(days=days_back)
+    def _execute_query(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """Execute SQL query and return its rows.
         
-        query = """
-        SELECT date, steps
-        FROM daily_summaries 
-        WHERE date >= ? AND date <= ? AND steps IS NOT NULL
-        ORDER BY date DESC
+        Rows support key access like dicts; convert with dict(row) only where the
+        rows are returned to callers.
         """
+        with self._lock:
+            return self._conn.execute(query, params).fetchall()
+    
+    def _execute_query_stream(self, query: str, params: tuple = ()) -> Iterator[sqlite3.Row]:
+        """Execute SQL query and yield its rows in batches as SQLite steps the cursor.
         
-        results = self._execute_query(query, (start_date, end_date))
-        
-        if not results:
+        For single-pass callers that don't keep the rows. The connection lock is
+        only held while a batch is fetched, never across a yield, so the consumer
+        may use the service mid-iteration and other threads aren't stalled.
+        """
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            with self._lock:
+                cursor.close()
+    
+    def _execute_aggregate(self, query: str, params: tuple = ()) -> sqlite3.Row:
+        """Execute a single-row aggregate SQL query (SUM/AVG/MIN/MAX computed by SQLite)."""
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()
+    
+    @staticmethod
+    def _steps_section(period: str, totals: sqlite3.Row, rows: List[sqlite3.Row]) -> Dict[str, Any]:
+        """Steps result from DAILY_TOTALS_QUERY totals and rows that include steps."""
+        if not totals['step_days']:
             return {"message": "No step data found for the requested period"}
         
-        total_steps = sum(row['steps'] for row in results)
-        avg_steps = total_steps / len(results)
-        
         return {
-            "period": f"Last {days_back} days",
-            "total_steps": total_steps,
-            "average_steps": round(avg_steps),
-            "days_with_data": len(results),
-            "daily_breakdown": results
+            "period": period,
+            "total_steps": totals['total_steps'],
+            "average_steps": round(totals['total_steps'] / totals['step_days']),
+            "days_with_data": totals['step_days'],
+            "daily_breakdown": [
+                {"date": row['date'], "steps": row['steps']}
+                for row in rows if row['steps'] is not None
+            ]
         }
     
-    def get_heart_rate_summary(self, days_back: int = 7) -> Dict[str, Any]:
-        """Get heart rate summary for the last N days."""
-        end_date = self._get_user_current_date()
-        start_date = end_date - timedelta(days=days_back)
-        
-        query = """
-        SELECT date, avg_heart_rate, min_heart_rate, max_heart_rate
-        FROM daily_summaries 
-        WHERE date >= ? AND date <= ? AND avg_heart_rate IS NOT NULL
-        ORDER BY date DESC
-        """
+    @staticmethod
+    def _heart_rate_section(period: str, totals: sqlite3.Row, rows: List[sqlite3.Row]) -> Dict[str, Any]:
+        """Heart rate result from DAILY_TOTALS_QUERY totals and rows that include heart rate."""
+        if not totals['heart_rate_days']:
+            return {"message": "No heart rate data found for the requested period"}
         
-        results = self._execute_query(query, (start_date, end_date))
+        return {
+            "period": period,
+            "average_heart_rate": round(totals['average_heart_rate']),
+            "lowest_heart_rate": totals['lowest_heart_rate'],
+            "highest_heart_rate": totals['highest_heart_rate'],
+            "days_with_data": totals['heart_rate_days'],
+            "daily_breakdown": [
+                {
+                    "date": row['date'],
+                    "avg_heart_rate": row['avg_heart_rate'],
+                    "min_heart_rate": row['min_heart_rate'],
+                    "max_heart_rate": row['max_heart_rate']
+                }
+                for row in rows if row['avg_heart_rate'] is not None
+            ]
+        }
+    
+    @staticmethod
+    def _weight_section(period: str, rows: List[sqlite3.Row]) -> Dict[str, Any]:
+        """Weight result from newest-first rows that include body mass."""
+        rows = [row for row in rows if row['body_mass_kg'] is not None]
+        if not rows:
+            return {"message": "No weight data found for the requested period"}
         
-        if not results:
-            return {"message": "No heart rate data found for the requested period"}
+        current_weight = rows[0]['body_mass_kg']
+        previous_weight = rows[-1]['body_mass_kg']
+        weight_change = current_weight - previous_weight
         
-        avg_hr = sum(row['avg_heart_rate'] for row in results) / len(results)
-        overall_min = min(row['min_heart_rate'] for row in results)
-        overall_max = max(row['max_heart_rate'] for row in results)
+        return {
+            "period": period,
+            "current_weight": round(current_weight, 1),
+            "weight_change": round(weight_change, 1),
+            "measurements_count": len(rows),
+            "recent_measurements": [  # Show last 5
+                {
+                    "date": row['date'],
+                    "body_mass_kg": row['body_mass_kg'],
+                    "body_fat_percentage": row['body_fat_percentage']
+                }
+                for row in rows[:5]
+            ]
+        }
+    
+    @staticmethod
+    def _activity_section(period: str, totals: sqlite3.Row, rows: List[sqlite3.Row]) -> Dict[str, Any]:
+        """Activity result from DAILY_TOTALS_QUERY totals and rows that include activity."""
+        days_count = totals['days_count']
+        if not days_count:
+            return {"message": "No activity data found for the requested period"}
         
         return {
-            "period": f"Last {days_back} days",
-            "average_heart_rate": round(avg_hr),
-            "lowest_heart_rate": overall_min,
-            "highest_heart_rate": overall_max,
-            "days_with_data": len(results),
-            "daily_breakdown": results
+            "period": period,
+            "summary": {
+                "total_steps": totals['total_steps'],
+                "average_daily_steps": round(totals['total_steps'] / days_count),
+                "total_active_energy": round(totals['total_energy']),
+                "total_exercise_minutes": round(totals['total_exercise_time']),
+                "total_distance_km": round(totals['total_distance'], 2),
+                "days_with_data": days_count
+            },
+            "daily_breakdown": [
+                {
+                    "date": row['date'],
+                    "steps": row['steps'],
+                    "active_energy_burned": row['active_energy_burned'],
+                    "exercise_time_minutes": row['exercise_time_minutes'],
+                    "distance_walking_km": row['distance_walking_km']
+                }
+                for row in rows
+            ]
         }
     
+    @_bounded_days_back
+    @_ttl_cached
+    def get_daily_steps(self, days_back: int = 7) -> Dict[str, Any]:
+        """Get daily step counts for the last N days."""
+        end_date = self._get_user_current_date()
+        start_date = end_date - timedelta(days=days_back)
+        
+        # Totals are computed by SQLite; the detail rows are only fetched when there is data
+        totals = self._execute_aggregate(DAILY_TOTALS_QUERY, (start_date, end_date))
+        rows = self._execute_query(STEPS_QUERY, (start_date, end_date)) if totals['step_days'] else []
+        return self._steps_section(f"Last {days_back} days", totals, rows)
+    
+    @_bounded_days_back
+    @_ttl_cached
+    def get_heart_rate_summary(self, days_back: int = 7) -> Dict[str, Any]:
+        """Get heart rate summary for the last N days."""
+        end_date = self._get_user_current_date()
+        start_date = end_date - timedelta(days=days_back)
+        
+        totals = self._execute_aggregate(DAILY_TOTALS_QUERY, (start_date, end_date))
+        rows = self._execute_query(HEART_RATE_QUERY, (start_date, end_date)) if totals['heart_rate_days'] else []
+        return self._heart_rate_section(f"Last {days_back} days", totals, rows)
+    
+    @_ttl_cached
     def get_recent_workouts(self, limit: int = 10) -> Dict[str, Any]:
         """Get recent workout activities."""
-        query = """
-        SELECT workout_type, start_date, duration_minutes, 
-               total_energy_burned, total_distance_km
-        FROM workouts 
-        ORDER BY start_date DESC 
-        LIMIT ?
-        """
+        # SQLite treats a negative LIMIT as no limit at all
+        if limit < 0:
+            return {"message": "Invalid limit"}
         
-        results = self._execute_query(query, (limit,))
+        totals = self._execute_aggregate(RECENT_WORKOUTS_TOTALS_QUERY, (limit,))
         
-        if not results:
+        if not totals['total_workouts']:
             return {"message": "No workout data found"}
         
-        total_workouts = len(results)
-        total_energy = sum(row['total_energy_burned'] or 0 for row in results)
-        total_duration = sum(row['duration_minutes'] or 0 for row in results)
-        total_distance = sum(row['total_distance_km'] or 0 for row in results)
+        results = self._execute_query(RECENT_WORKOUTS_QUERY, (limit,))
         
         return {
-            "total_workouts": total_workouts,
-            "total_energy_burned": round(total_energy),
-            "total_duration_minutes": round(total_duration),
-            "total_distance_km": round(total_distance, 2),
-            "recent_workouts": results
+            "total_workouts": totals['total_workouts'],
+            "total_energy_burned": round(totals['total_energy_burned']),
+            "total_duration_minutes": round(totals['total_duration_minutes']),
+            "total_distance_km": round(totals['total_distance_km'], 2),
+            "recent_workouts": [dict(row) for row in results]
         }
     
+    @_bounded_days_back
+    @_ttl_cached
     def get_weight_progress(self, days_back: int = 30) -> Dict[str, Any]:
         """Get weight tracking progress."""
         end_date = self._get_user_current_date()
         start_date = end_date - timedelta(days=days_back)
         
-        query = """
-        SELECT date, body_mass_kg, body_fat_percentage
-        FROM daily_summaries 
-        WHERE date >= ? AND date <= ? AND body_mass_kg IS NOT NULL
-        ORDER BY date DESC
-        """
-        
-        results = self._execute_query(query, (start_date, end_date))
-        
-        if not results:
-            return {"message": "No weight data found for the requested period"}
-        
-        current_weight = results[0]['body_mass_kg']
-        previous_weight = results[-1]['body_mass_kg']
-        weight_change = current_weight - previous_weight
-        
-        return {
-            "period": f"Last {days_back} days",
-            "current_weight": round(current_weight, 1),
-            "weight_change": round(weight_change, 1),
-            "measurements_count": len(results),
-            "recent_measurements": results[:5]  # Show last 5
-        }
+        rows = self._execute_query(WEIGHT_QUERY, (start_date, end_date))
+        return self._weight_section(f"Last {days_back} days", rows)
     
+    @_bounded_days_back
+    @_ttl_cached
     def get_activity_summary(self, days_back: int = 7) -> Dict[str, Any]:
         """Get comprehensive activity summary."""
         end_date = self._get_user_current_date()
         start_date = end_date - timedelta(days=days_back)
         
-        query = """
-        SELECT date, steps, active_energy_burned, 
-               exercise_time_minutes, distance_walking_km
-        FROM daily_summaries 
-        WHERE date >= ? AND date <= ?
-        ORDER BY date DESC
-        """
-        
-        results = self._execute_query(query, (start_date, end_date))
-        
-        if not results:
-            return {"message": "No activity data found for the requested period"}
+        totals = self._execute_aggregate(DAILY_TOTALS_QUERY, (start_date, end_date))
+        rows = self._execute_query(ACTIVITY_QUERY, (start_date, end_date)) if totals['days_count'] else []
+        return self._activity_section(f"Last {days_back} days", totals, rows)
+    
+    @_bounded_days_back
+    @_ttl_cached
+    def get_all_daily_metrics(self, days_back: int = 7) -> Dict[str, Any]:
+        """Get steps, heart rate, weight and activity for the last N days in two queries.
         
-        # Calculate totals and averages
-        total_steps = sum(row['steps'] or 0 for row in results)
-        total_energy = sum(row['active_energy_burned'] or 0 for row in results)
-        total_exercise_time = sum(row['exercise_time_minutes'] or 0 for row in results)
-        total_distance = sum(row['distance_walking_km'] or 0 for row in results)
+        Each section is built by the same helper as the matching single-metric
+        method, from one totals query and one detail query covering every metric.
+        """
+        end_date = self._get_user_current_date()
+        start_date = end_date - timedelta(days=days_back)
+        period = f"Last {days_back} days"
         
-        days_count = len(results)
+        totals = self._execute_aggregate(DAILY_TOTALS_QUERY, (start_date, end_date))
+        rows = self._execute_query(DAILY_METRICS_QUERY, (start_date, end_date)) if totals['days_count'] else []
         
         return {
-            "period": f"Last {days_back} days",
-            "summary": {
-                "total_steps": total_steps,
-                "average_daily_steps": round(total_steps / days_count),
-                "total_active_energy": round(total_energy),
-                "total_exercise_minutes": round(total_exercise_time),
-                "total_distance_km": round(total_distance, 2),
-                "days_with_data": days_count
-            },
-            "daily_breakdown": results
+            "period": period,
+            "steps": self._steps_section(period, totals, rows),
+            "heart_rate": self._heart_rate_section(period, totals, rows),
+            "weight": self._weight_section(period, rows),
+            "activity": self._activity_section(period, totals, rows)
         }
     
+    @_bounded_days_back
+    @_ttl_cached
     def get_sleep_data(self, days_back: int = 7) -> Dict[str, Any]:
         """Get sleep data for the last N days - handles both old iPhone and new Apple Watch formats."""
         end_date = self._get_user_current_date()
         start_date = end_date - timedelta(days=days_back)
         
-        # Get individual sleep records and aggregate by date and type
-        query = """
-        SELECT 
-            DATE(start_date) as sleep_date,
-            value as duration_hours,
-            start_date,
-            end_date,
-            source_name,
-            sleep_stage,
-            data_type
-        FROM sleep_records 
-        WHERE DATE(start_date) >= ? AND DATE(start_date) <= ?
-        ORDER BY start_date DESC
-        """
-        
-        results = self._execute_query(query, (start_date, end_date))
-        
-        if not results:
-            return {"message": "No sleep data found for the requested period"}
+        # Half-open range on the raw ISO strings so the start_date index is used
+        start_iso = start_date.isoformat()
+        end_iso = (end_date + timedelta(days=1)).isoformat()
         
-        # Aggregate by date, handling both old and new formats
+        # Per-day totals are summed in SQL (one row per date, type, stage and source);
+        # the grouped rows are merged by date as they stream off the cursor, handling
+        # both old and new formats
         daily_sleep = {}
-        for record in results:
-            date = record['sleep_date']
+        first_starts = {}
+        raw_records_count = 0
+        for row in self._execute_query_stream(SLEEP_QUERY, (start_iso, end_iso)):
+            date = row['sleep_date']
             if date not in daily_sleep:
                 daily_sleep[date] = {
                     'date': date,
@@ -335,19 +612,29 @@ class HealthDataService:
                     'sources': set()
                 }
             
-            daily_sleep[date]['sources'].add(record['source_name'])
+            day = daily_sleep[date]
+            day['sources'].add(row['source_name'])
+            raw_records_count += row['record_count']
             
             # Handle old iPhone format (total time in bed)
-            if record['data_type'] == 'total_time_in_bed':
-                daily_sleep[date]['time_in_bed_hours'] += record['duration_hours']
-                daily_sleep[date]['data_source'] = 'iPhone'
+            if row['data_type'] == 'total_time_in_bed':
+                day['time_in_bed_hours'] += row['duration_hours']
+                source = 'iPhone'
             
             # Handle new Apple Watch format (sleep stages)
-            elif record['data_type'] == 'sleep_stage':
-                stage = record['sleep_stage']
-                if stage in ['Core', 'REM', 'Deep']:
-                    daily_sleep[date]['sleep_stages'][stage] += record['duration_hours']
-                    daily_sleep[date]['data_source'] = 'Apple Watch'
+            elif row['data_type'] == 'sleep_stage' and row['sleep_stage'] in ('Core', 'REM', 'Deep'):
+                day['sleep_stages'][row['sleep_stage']] += row['duration_hours']
+                source = 'Apple Watch'
+            else:
+                continue
+            
+            # The earliest record of the night decides the data source
+            if date not in first_starts or row['first_start'] < first_starts[date]:
+                first_starts[date] = row['first_start']
+                day['data_source'] = source
+        
+        if not daily_sleep:
+            return {"message": "No sleep data found for the requested period"}
         
         # Calculate total sleep for Apple Watch data and clean up
         daily_breakdown = []
@@ -389,7 +676,7 @@ class HealthDataService:
             "apple_watch_days": watch_days,
             "iphone_days": phone_days,
             "daily_breakdown": daily_breakdown,
-            "raw_records_count": len(results)
+            "raw_records_count": raw_records_count
         }
     
     def search_health_data(self, metric_type: str, days_back: int = 7) -> Dict[str, Any]:
@@ -400,7 +687,8 @@ class HealthDataService:
             "workouts": lambda d: self.get_recent_workouts(limit=d),
             "weight": self.get_weight_progress,
             "activity": self.get_activity_summary,
-            "sleep": self.get_sleep_data
+            "sleep": self.get_sleep_data,
+            "all": self.get_all_daily_metrics
         }
         
         if metric_type.lower() not in metric_map:
@@ -412,5 +700,7 @@ class HealthDataService:
         return metric_map[metric_type.lower()](days_back)
 
 
-# Global health data service instance
-health_service = HealthDataService() 
\ No newline at end of file
+@functools.lru_cache(maxsize=1)
+def get_health_service() -> HealthDataService:
+    """Get the shared health data service, created on first use rather than at import."""
+    return HealthDataService()
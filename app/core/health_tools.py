@@ -3,11 +3,20 @@ LangChain tools for accessing health data.
 These tools allow agents to query real health data from the SQLite database.
 Now includes timezone-aware functionality.
 """
-import json
+import functools
+import os
 import re
-from typing import Dict, Any
-from langchain_core.tools import Tool
-from app.core.health_data_service import health_service
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
+
+import orjson
+from app.core.health_data_service import get_health_service
+
+if TYPE_CHECKING:
+    from langchain_core.tools import Tool
+
+
+# First run of digits in a tool argument
+_INT_RE = re.compile(r'\d+')
 
 
 def _parse_integer_from_input(input_str: str, default: int = 7) -> int:
@@ -18,8 +27,21 @@ def _parse_integer_from_input(input_str: str, default: int = 7) -> int:
     if not input_str:
         return default
     
+    # Native tool calling can hand over a real int; no string round trip needed
+    if type(input_str) is int and input_str > 0:
+        return input_str
+    
+    # Most inputs are plain or quoted digits ("7", "'30'"); int() handles those
+    # without the regex engine. isdecimal() matches exactly what \d and int() accept.
+    if isinstance(input_str, str):
+        stripped = input_str.strip().strip("'\"")
+        if stripped.isdecimal():
+            return int(stripped)
+    else:
+        input_str = str(input_str)
+    
     # Use regex to find the first integer in the string
-    match = re.search(r'\d+', str(input_str))
+    match = _INT_RE.search(input_str)
     if match:
         return int(match.group())
     
@@ -27,11 +49,32 @@ def _parse_integer_from_input(input_str: str, default: int = 7) -> int:
     return default
 
 
+# Tool output is read by the LLM, so it is compact JSON by default (fewer tokens and
+# bytes); set TOOL_JSON_COMPACT=0 to get indented output when debugging locally
+_COMPACT = os.getenv("TOOL_JSON_COMPACT", "1") == "1"
+_JSON_OPTIONS = 0 if _COMPACT else orjson.OPT_INDENT_2
+
+
+def _dumps(result: Dict[str, Any]) -> str:
+    """Serialize a tool result as JSON (orjson; str() for any non-JSON value)."""
+    return orjson.dumps(result, default=str, option=_JSON_OPTIONS).decode()
+
+
+# Serialized timezone info; the service resolves the timezone once at startup, so
+# this never changes for the life of the process
+_TZ_JSON: Optional[str] = None
+
+
 def get_timezone_info_tool(unused_input: str = "") -> str:
     """Get user's timezone information. Ignores any input parameter."""
+    global _TZ_JSON
+    if _TZ_JSON is not None:
+        return _TZ_JSON
+    
     try:
-        result = health_service.get_user_timezone_info()
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_user_timezone_info()
+        _TZ_JSON = _dumps(result)
+        return _TZ_JSON
     except Exception as e:
         return f"Error getting timezone info: {str(e)}"
 
@@ -40,8 +83,8 @@ def get_steps_tool(days_back: str = "7") -> str:
     """Get daily step counts for the specified number of days back."""
     try:
         days = _parse_integer_from_input(days_back, 7)
-        result = health_service.get_daily_steps(days)
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_daily_steps(days)
+        return _dumps(result)
     except Exception as e:
         return f"Error getting step data: {str(e)}"
 
@@ -50,8 +93,8 @@ def get_heart_rate_tool(days_back: str = "7") -> str:
     """Get heart rate summary for the specified number of days back."""
     try:
         days = _parse_integer_from_input(days_back, 7)
-        result = health_service.get_heart_rate_summary(days)
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_heart_rate_summary(days)
+        return _dumps(result)
     except Exception as e:
         return f"Error getting heart rate data: {str(e)}"
 
@@ -60,8 +103,8 @@ def get_workouts_tool(limit: str = "10") -> str:
     """Get recent workout activities."""
     try:
         workout_limit = _parse_integer_from_input(limit, 10)
-        result = health_service.get_recent_workouts(workout_limit)
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_recent_workouts(workout_limit)
+        return _dumps(result)
     except Exception as e:
         return f"Error getting workout data: {str(e)}"
 
@@ -70,8 +113,8 @@ def get_weight_tool(days_back: str = "30") -> str:
     """Get weight tracking progress for the specified number of days back."""
     try:
         days = _parse_integer_from_input(days_back, 30)
-        result = health_service.get_weight_progress(days)
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_weight_progress(days)
+        return _dumps(result)
     except Exception as e:
         return f"Error getting weight data: {str(e)}"
 
@@ -80,8 +123,8 @@ def get_activity_summary_tool(days_back: str = "7") -> str:
     """Get comprehensive activity summary for the specified number of days back."""
     try:
         days = _parse_integer_from_input(days_back, 7)
-        result = health_service.get_activity_summary(days)
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_activity_summary(days)
+        return _dumps(result)
     except Exception as e:
         return f"Error getting activity data: {str(e)}"
 
@@ -92,15 +135,15 @@ def search_health_data_tool(metric_and_days: str) -> str:
         if not metric_and_days:
             return "Error: Please provide metric type and days in format 'metric_type,days_back'"
         
-        parts = metric_and_days.split(',')
-        if len(parts) != 2:
+        head, sep, tail = metric_and_days.partition(',')
+        if not sep or ',' in tail:
             return "Error: Please provide metric type and days in format 'metric_type,days_back' (e.g., 'steps,7')"
         
-        metric_type = parts[0].strip()
-        days_back = _parse_integer_from_input(parts[1].strip(), 7)
+        metric_type = head.strip()
+        days_back = _parse_integer_from_input(tail.strip(), 7)
         
-        result = health_service.search_health_data(metric_type, days_back)
-        return json.dumps(result, indent=2)
+        result = get_health_service().search_health_data(metric_type, days_back)
+        return _dumps(result)
     except Exception as e:
         return f"Error searching health data: {str(e)}"
 
@@ -109,86 +152,131 @@ def get_sleep_data_tool(days_back: str = "7") -> str:
     """Get sleep data and patterns. Input should be just the number of days (e.g., 7 for last week, 30 for last month). Shows total sleep hours, sleep stages (Core/REM/Deep), and sleep quality trends."""
     try:
         days = _parse_integer_from_input(days_back, 7)
-        result = health_service.get_sleep_data(days)
-        return json.dumps(result, indent=2)
+        result = get_health_service().get_sleep_data(days)
+        return _dumps(result)
     except Exception as e:
         return f"Error getting sleep data: {str(e)}"
 
 
-# Create LangChain Tool objects with clear descriptions
-health_tools = [
-    Tool(
-        name="get_user_timezone",
-        description="Get user's timezone information. No input needed - just use empty string or None.",
-        func=get_timezone_info_tool
-    ),
-    Tool(
-        name="get_daily_steps",
-        description="Get daily step counts. Input should be just the number of days (e.g., 7)",
-        func=get_steps_tool
-    ),
-    Tool(
-        name="get_heart_rate_summary",
-        description="Get heart rate summary. Input should be just the number of days (e.g., 7)",
-        func=get_heart_rate_tool
-    ),
-    Tool(
-        name="get_recent_workouts",
-        description="Get recent workout activities. Input should be just the number of workouts (e.g., 10)",
-        func=get_workouts_tool
-    ),
-    Tool(
-        name="get_weight_progress",
-        description="Get weight tracking progress. Input should be just the number of days (e.g., 30)",
-        func=get_weight_tool
-    ),
-    Tool(
-        name="get_activity_summary",
-        description="Get comprehensive activity summary. Input should be just the number of days (e.g., 7)",
-        func=get_activity_summary_tool
-    ),
-    Tool(
-        name="search_health_data",
-        description="Search for specific health metrics. Input format: 'metric_type,days_back' (e.g., 'steps,7')",
-        func=search_health_data_tool
-    ),
-    Tool(
-        name="get_sleep_data",
-        description="Get sleep data and patterns. Input should be just the number of days (e.g., 7)",
-        func=get_sleep_data_tool
+def get_health_dashboard_tool(days_back: str = "7") -> str:
+    """Get a health snapshot (timezone, steps, heart rate, weight and activity) in one call."""
+    try:
+        days = _parse_integer_from_input(days_back, 7)
+        service = get_health_service()
+        # One daily_summaries query covers every metric section
+        result = {"timezone": service.get_user_timezone_info(), **service.get_all_daily_metrics(days)}
+        return _dumps(result)
+    except Exception as e:
+        return f"Error getting health dashboard: {str(e)}"
+
+
+@functools.lru_cache(maxsize=1)
+def _health_tools() -> Tuple["Tool", ...]:
+    """Build the LangChain Tool objects on first use.
+    
+    langchain_core is imported here rather than at module load, so importing the
+    tool functions alone (tests, scripts) doesn't pull in LangChain.
+    """
+    from langchain_core.tools import Tool
+    
+    # Create LangChain Tool objects with clear descriptions
+    return (
+        Tool(
+            name="get_user_timezone",
+            description="Get user's timezone information. No input needed - just use empty string or None.",
+            func=get_timezone_info_tool
+        ),
+        Tool(
+            name="get_daily_steps",
+            description="Get daily step counts. Input should be just the number of days (e.g., 7)",
+            func=get_steps_tool
+        ),
+        Tool(
+            name="get_heart_rate_summary",
+            description="Get heart rate summary. Input should be just the number of days (e.g., 7)",
+            func=get_heart_rate_tool
+        ),
+        Tool(
+            name="get_recent_workouts",
+            description="Get recent workout activities. Input should be just the number of workouts (e.g., 10)",
+            func=get_workouts_tool
+        ),
+        Tool(
+            name="get_weight_progress",
+            description="Get weight tracking progress. Input should be just the number of days (e.g., 30)",
+            func=get_weight_tool
+        ),
+        Tool(
+            name="get_activity_summary",
+            description="Get comprehensive activity summary. Input should be just the number of days (e.g., 7)",
+            func=get_activity_summary_tool
+        ),
+        Tool(
+            name="search_health_data",
+            description="Search for specific health metrics. Input format: 'metric_type,days_back' (e.g., 'steps,7', or 'all,7' for steps, heart rate, weight and activity together)",
+            func=search_health_data_tool
+        ),
+        Tool(
+            name="get_sleep_data",
+            description="Get sleep data and patterns. Input should be just the number of days (e.g., 7)",
+            func=get_sleep_data_tool
+        ),
+        Tool(
+            name="get_health_dashboard",
+            description="Get a combined snapshot of steps, heart rate, weight and activity in one call. Input should be just the number of days (e.g., 7)",
+            func=get_health_dashboard_tool
+        )
     )
-]
 
 
-def get_fitness_tools():
+# Tools offered to each agent role, by tool name, so reordering the tool list
+# can't silently hand a role the wrong tool
+FITNESS_TOOL_NAMES = (
+    "get_user_timezone",
+    "get_daily_steps",
+    "get_heart_rate_summary",
+    "get_recent_workouts",
+    "get_activity_summary",
+    "get_health_dashboard",
+)
+NUTRITION_TOOL_NAMES = (
+    "get_user_timezone",
+    "get_weight_progress",
+    "get_activity_summary",  # for calorie burn
+)
+WELLNESS_TOOL_NAMES = (
+    "get_heart_rate_summary",  # stress indicator
+    "get_activity_summary",  # overall wellness
+    "get_sleep_data",  # sleep quality and duration
+    "get_health_dashboard",  # overall snapshot
+)
+
+
+def _select_tools(names: Tuple[str, ...]) -> Tuple["Tool", ...]:
+    """Pick tools by name, in the given order."""
+    tools_by_name = {tool.name: tool for tool in _health_tools()}
+    return tuple(tools_by_name[name] for name in names)
+
+
+@functools.lru_cache(maxsize=1)
+def get_fitness_tools() -> Tuple["Tool", ...]:
     """Get tools relevant for fitness agent."""
-    return [
-        health_tools[0],  # timezone
-        health_tools[1],  # steps
-        health_tools[2],  # heart_rate
-        health_tools[3],  # workouts
-        health_tools[5],  # activity_summary
-    ]
+    return _select_tools(FITNESS_TOOL_NAMES)
 
 
-def get_nutrition_tools():
+@functools.lru_cache(maxsize=1)
+def get_nutrition_tools() -> Tuple["Tool", ...]:
     """Get tools relevant for nutrition agent."""
-    return [
-        health_tools[0],  # timezone
-        health_tools[4],  # weight
-        health_tools[5],  # activity_summary (for calorie burn)
-    ]
+    return _select_tools(NUTRITION_TOOL_NAMES)
 
 
-def get_wellness_tools():
+@functools.lru_cache(maxsize=1)
+def get_wellness_tools() -> Tuple["Tool", ...]:
     """Get tools relevant for wellness agent."""
-    return [
-        health_tools[2],  # heart_rate (stress indicator)
-        health_tools[5],  # activity_summary (overall wellness)
-        health_tools[7],  # sleep_data (sleep quality and duration)
-    ]
+    return _select_tools(WELLNESS_TOOL_NAMES)
 
 
-def get_general_tools():
+@functools.lru_cache(maxsize=1)
+def get_general_tools() -> Tuple["Tool", ...]:
     """Get all tools for general health agent."""
-    return health_tools 
\ No newline at end of file
+    return _health_tools() 
\ No newline at end of file
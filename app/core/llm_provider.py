@@ -2,18 +2,58 @@
 LLM Provider abstraction supporting multiple providers through LangChain.
 Ollama is the primary open-source option, with API-based providers available.
 """
+import importlib
 import os
+import threading
+from types import ModuleType
+from typing import Dict, Optional
 from langchain_core.language_models import BaseChatModel
 
+# Providers whose chat models reliably support native function calling
+TOOL_CALLING_PROVIDERS = {"openai", "anthropic", "google", "azure"}
+
+# Provider integrations are imported on first use only, so a process pays for the
+# LangChain package it actually talks to and nothing else
+_MODULES: Dict[str, ModuleType] = {}
+
+
+def _lazy(name: str) -> ModuleType:
+    """Import a provider integration module once and reuse it."""
+    module = _MODULES.get(name)
+    if module is None:
+        module = importlib.import_module(name)
+        _MODULES[name] = module
+    return module
+
 
 class LLMProvider:
     """Factory for creating LLM instances based on configuration."""
     
-    def __init__(self):
-        self.provider = os.getenv("LLM_PROVIDER", "ollama")
+    def __init__(self, provider: Optional[str] = None):
+        # An explicit provider (e.g. per API request) overrides LLM_PROVIDER
+        self.provider = provider or os.getenv("LLM_PROVIDER", "ollama")
+        
+        # Chat models hold HTTP clients and are safe to share, so build one per provider
+        self._cached: Optional[BaseChatModel] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def supports_tool_calling(self) -> bool:
+        """Whether the configured provider supports native tool calling (small local models do not)."""
+        return self.provider in TOOL_CALLING_PROVIDERS
     
     def get_llm(self) -> BaseChatModel:
-        """Get the configured LLM instance."""
+        """Get the configured LLM instance, building it on first use."""
+        llm = self._cached
+        if llm is None:
+            with self._lock:
+                if self._cached is None:
+                    self._cached = self._build_llm()
+                llm = self._cached
+        return llm
+    
+    def _build_llm(self) -> BaseChatModel:
+        """Construct a new LLM instance for the configured provider."""
         if self.provider == "ollama":
             return self._get_ollama_llm()
         elif self.provider == "openai":
@@ -29,7 +69,7 @@ class LLMProvider:
     
     def _get_ollama_llm(self) -> BaseChatModel:
         """Get Ollama LLM instance (open source)."""
-        from langchain_ollama import ChatOllama
+        ChatOllama = _lazy("langchain_ollama").ChatOllama
         
         model = os.getenv("OLLAMA_MODEL", "llama3.2:3b")
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
@@ -46,7 +86,7 @@ class LLMProvider:
     
     def _get_openai_llm(self) -> BaseChatModel:
         """Get OpenAI LLM instance."""
-        from langchain_openai import ChatOpenAI
+        ChatOpenAI = _lazy("langchain_openai").ChatOpenAI
         
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
@@ -64,7 +104,7 @@ class LLMProvider:
     def _get_anthropic_llm(self) -> BaseChatModel:
         """Get Anthropic Claude LLM instance."""
         try:
-            from langchain_anthropic import ChatAnthropic
+            ChatAnthropic = _lazy("langchain_anthropic").ChatAnthropic
         except ImportError:
             raise ImportError("Install langchain-anthropic: pip install langchain-anthropic")
         
@@ -85,7 +125,7 @@ class LLMProvider:
     def _get_google_llm(self) -> BaseChatModel:
         """Get Google Gemini LLM instance."""
         try:
-            from langchain_google_genai import ChatGoogleGenerativeAI
+            ChatGoogleGenerativeAI = _lazy("langchain_google_genai").ChatGoogleGenerativeAI
         except ImportError:
             raise ImportError("Install langchain-google-genai: pip install langchain-google-genai")
         
@@ -104,7 +144,7 @@ class LLMProvider:
     
     def _get_azure_llm(self) -> BaseChatModel:
         """Get Azure OpenAI LLM instance."""
-        from langchain_openai import AzureChatOpenAI
+        AzureChatOpenAI = _lazy("langchain_openai").AzureChatOpenAI
         
         api_key = os.getenv("AZURE_OPENAI_API_KEY")
         endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
@@ -1,14 +1,18 @@
 """
 Centralized logging configuration for LifeBuddy.
 Provides both console and file logging with proper formatting.
+Pass values as logging arguments (logger.debug("x=%s", value)) rather than f-strings
+on hot paths, so records below the configured level are never formatted.
 """
 
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 # Create logs directory if it doesn't exist
 LOGS_DIR = Path("logs")
@@ -21,6 +25,38 @@ DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 # Console format with emojis for better UX
 CONSOLE_FORMAT = "%(levelname_emoji)s %(message)s"
 
+# Logging levels by name, resolved without getattr() reflection
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+# Minimum level written to log files (console shows INFO and above); production can
+# set FILE_LOG_LEVEL=INFO so debug records are never queued or formatted for disk
+FILE_LOG_LEVEL = os.getenv("FILE_LOG_LEVEL", "DEBUG")
+
+# Loggers already set up, by name; repeated get_*_logger() calls return these directly
+_LOGGER_CACHE: Dict[str, logging.Logger] = {}
+
+# One queue handler per log file, shared by every logger that writes to it. Records
+# are handed to a background QueueListener that owns the file's single rotating
+# handler, so disk writes and rotation never block the logging thread.
+_HANDLERS: Dict[str, logging.handlers.QueueHandler] = {}
+
+def _level_from_name(name: str) -> int:
+    """Resolve a logging level name such as "INFO" or "warn" to its numeric level."""
+    name = name.upper()
+    level = _LEVELS.get(name)
+    if level is None:
+        # Aliases (WARN, FATAL) and custom levels registered with logging.addLevelName()
+        level = logging.getLevelName(name)
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown logging level: {name!r}")
+    return level
+
 class EmojiFormatter(logging.Formatter):
     """Custom formatter that adds emojis to log levels for console output."""
     
@@ -33,10 +69,36 @@ class EmojiFormatter(logging.Formatter):
     }
     
     def format(self, record):
-        # Add emoji to the record
-        record.levelname_emoji = self.EMOJI_MAP.get(record.levelname, '📝')
+        # Add emoji to the record (once, if several handlers format the same record)
+        if not hasattr(record, 'levelname_emoji'):
+            record.levelname_emoji = self.EMOJI_MAP.get(record.levelname, '📝')
         return super().format(record)
 
+def _start_file_listener(file_path: Path) -> logging.handlers.QueueHandler:
+    """Start a background writer for a log file and return the handler that feeds it."""
+    # Use rotating file handler to prevent huge log files
+    file_handler = logging.handlers.RotatingFileHandler(
+        file_path,
+        maxBytes=10 * 1024 * 1024,  # 10MB
+        backupCount=5,
+        encoding='utf-8'
+    )
+    file_level = _level_from_name(FILE_LOG_LEVEL)
+    file_handler.setLevel(file_level)
+    file_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    file_handler.setFormatter(file_formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    # Stopping drains the queue, so records logged just before exit still reach disk
+    atexit.register(listener.stop)
+    
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Filter before enqueueing so dropped records skip the queue and formatting
+    queue_handler.setLevel(file_level)
+    return queue_handler
+
 def setup_logger(
     name: str,
     level: str = "INFO",
@@ -57,13 +119,18 @@ def setup_logger(
     Returns:
         Configured logger instance
     """
+    logger = _LOGGER_CACHE.get(name)
+    if logger is not None:
+        return logger
+    
     logger = logging.getLogger(name)
     
     # Avoid duplicate handlers if logger already configured
     if logger.handlers:
+        _LOGGER_CACHE[name] = logger
         return logger
     
-    logger.setLevel(getattr(logging, level.upper()))
+    logger.setLevel(_level_from_name(level))
     
     # Console handler with emoji formatting
     if console_output:
@@ -78,18 +145,13 @@ def setup_logger(
         log_file = log_file or "app.log"
         file_path = LOGS_DIR / log_file
         
-        # Use rotating file handler to prevent huge log files
-        file_handler = logging.handlers.RotatingFileHandler(
-            file_path,
-            maxBytes=10 * 1024 * 1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)  # File logs everything
-        file_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
+        queue_handler = _HANDLERS.get(str(file_path))
+        if queue_handler is None:
+            queue_handler = _start_file_listener(file_path)
+            _HANDLERS[str(file_path)] = queue_handler
+        logger.addHandler(queue_handler)
     
+    _LOGGER_CACHE[name] = logger
     return logger
 
 def get_logger(name: str, **kwargs) -> logging.Logger:
@@ -132,8 +194,9 @@ def configure_root_logger(level: str = "INFO"):
     root_logger = logging.getLogger()
     
     # Don't configure if already done
-    if root_logger.handlers:
+    if getattr(configure_root_logger, "_done", False) or root_logger.handlers:
         return
+    configure_root_logger._done = True
         
     root_logger.setLevel(logging.DEBUG)
     
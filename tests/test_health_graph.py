@@ -0,0 +1,198 @@
+"""
+Tests for HealthAgentGraph turn handling, driven by fake chat models.
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app.agents.health_graph import HealthAgentGraph, MAX_TOOL_ROUNDS
+from app.agents.intent_classifier import HealthIntent, IntentClassifier
+from app.api.main import app
+
+
+class FakeToolCallingModel(FakeMessagesListChatModel):
+    """Fake chat model that accepts bound tools and replays scripted messages."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def tool_call_message(name, call_id, days_back="7"):
+    """An assistant message requesting a single tool call."""
+    return AIMessage(content="", tool_calls=[
+        {"name": name, "args": {"days_back": days_back}, "id": call_id}
+    ])
+
+
+def build_graph(llm, provider="openai", intent=HealthIntent.HEALTH):
+    """Build a graph around a fake LLM, with no database or real provider behind it."""
+    llm_provider = MagicMock()
+    llm_provider.get_llm.return_value = llm
+    llm_provider.supports_tool_calling = provider == "openai"
+    llm_provider.provider = provider
+
+    health_service = MagicMock()
+    health_service.get_user_timezone_info.return_value = {
+        "timezone_name": "UTC", "timezone_offset": "+0000"
+    }
+
+    with patch('app.agents.health_graph.LLMProvider', return_value=llm_provider), \
+         patch('app.agents.health_graph.get_health_service', return_value=health_service):
+        graph = HealthAgentGraph()
+
+    if intent is not None:
+        graph.intent_classifier.classify = MagicMock(return_value=intent)
+    graph._prefetch_tools = MagicMock()
+    graph._run_tool = MagicMock(side_effect=lambda tool, tool_input: f'{{"tool": "{tool.name}"}}')
+    return graph
+
+
+def test_native_tools_follow_up_rounds():
+    """A second round of tool calls is executed before the final answer is returned."""
+    llm = FakeToolCallingModel(responses=[
+        tool_call_message("get_sleep_data", "call_1"),
+        tool_call_message("get_daily_steps", "call_2"),
+        AIMessage(content="You slept well and walked plenty."),
+    ])
+    graph = build_graph(llm)
+
+    result = graph.chat("compare my sleep and steps", session_id="s1")
+
+    assert result["response"] == "You slept well and walked plenty."
+    assert [step["tool_name"] for step in result["thinking_chain"]] == ["get_sleep_data", "get_daily_steps"]
+
+
+def test_native_tools_round_cap():
+    """An LLM that keeps requesting tools gets a fallback answer, which is not cached."""
+    llm = FakeToolCallingModel(responses=[
+        tool_call_message("get_sleep_data", f"call_{i}") for i in range(MAX_TOOL_ROUNDS + 1)
+    ])
+    graph = build_graph(llm)
+
+    result = graph.chat("compare everything", session_id="s1")
+
+    assert result["response"]
+    assert graph._run_tool.call_count == MAX_TOOL_ROUNDS
+    assert not graph._response_cache
+
+
+def test_response_cache_is_per_session():
+    """A repeated message is answered from cache in its own session only."""
+    llm = FakeToolCallingModel(responses=[
+        tool_call_message("get_daily_steps", "call_1"),
+        AIMessage(content="First session answer."),
+        tool_call_message("get_daily_steps", "call_2"),
+        AIMessage(content="Second session answer."),
+    ])
+    graph = build_graph(llm)
+
+    first = graph.chat("show my steps for last week", session_id="s1")
+    repeated = graph.chat("Show my steps  for last week", session_id="s1")
+    other_session = graph.chat("show my steps for last week", session_id="s2")
+
+    assert first["response"] == repeated["response"] == "First session answer."
+    assert other_session["response"] == "Second session answer."
+    assert graph._run_tool.call_count == 2
+
+
+def test_cached_response_is_a_copy():
+    """Mutating a returned answer does not change what later callers get from the cache."""
+    llm = FakeToolCallingModel(responses=[
+        tool_call_message("get_daily_steps", "call_1"),
+        AIMessage(content="You walked 8,000 steps a day."),
+    ])
+    graph = build_graph(llm)
+
+    first = graph.chat("show my steps for last week", session_id="s1")
+    first["thinking_chain"].clear()
+    repeated = graph.chat("show my steps for last week", session_id="s1")
+
+    assert len(repeated["thinking_chain"]) == 1
+
+
+def test_fitness_answers_are_not_cached():
+    """Fitness answers depend on the editable user profile, so each turn asks the agent again."""
+    fitness_agent = MagicMock()
+    fitness_agent.process_query.side_effect = ["Old plan.", "Updated plan."]
+    graph = build_graph(FakeToolCallingModel(responses=[AIMessage(content="unused")]),
+                        intent=HealthIntent.FITNESS)
+
+    with patch('app.agents.health_graph.get_fitness_agent', return_value=fitness_agent):
+        first = graph.chat("give me a workout plan", session_id="s1")
+        second = graph.chat("give me a workout plan", session_id="s1")
+
+    assert first["response"] == "Old plan."
+    assert second["response"] == "Updated plan."
+
+
+def test_chat_without_session_is_not_cached():
+    """/chat requests without a session id don't share cached answers."""
+    graph = build_graph(FakeToolCallingModel(responses=[
+        tool_call_message("get_daily_steps", "call_1"),
+        AIMessage(content="First answer."),
+        tool_call_message("get_daily_steps", "call_2"),
+        AIMessage(content="Second answer."),
+    ]))
+
+    with patch('app.api.main.health_agent', graph):
+        client = TestClient(app)
+        first = client.post("/chat", json={"message": "show my steps for last week"})
+        second = client.post("/chat", json={"message": "show my steps for last week"})
+
+    assert first.json()["response"] == "First answer."
+    assert second.json()["response"] == "Second answer."
+    assert first.json()["session_id"] == "default"
+    assert not graph._response_cache
+
+
+def test_intent_cache_keys_on_the_full_query():
+    """Long queries sharing a prefix are classified separately; whitespace and case are not."""
+    prefix = "I have been tracking everything for months now and " * 10
+    llm_provider = MagicMock()
+    llm_provider.get_llm.return_value = GenericFakeChatModel(messages=iter([
+        AIMessage(content="fitness"),
+        AIMessage(content="health"),
+    ]))
+    classifier = IntentClassifier()
+
+    with patch('app.agents.intent_classifier.llm_provider', llm_provider):
+        first = classifier.classify(prefix + "what workout should I do today?")
+        second = classifier.classify(prefix + "show my steps for last week")
+        repeated = classifier.classify(" " + (prefix + "SHOW my steps  for last week").upper())
+
+    assert first == HealthIntent.FITNESS
+    assert second == repeated == HealthIntent.HEALTH
+
+
+def test_chat_stream_forwards_only_the_answer():
+    """/chat/stream uses the requested provider's agent and streams only answer tokens."""
+    graph = build_graph(GenericFakeChatModel(messages=iter([
+        AIMessage(content="TOOL: get_daily_steps\nINPUT: 7"),
+        AIMessage(content="You walked 8,000 steps a day this week."),
+    ])), provider="ollama", intent=None)
+    intent_llm_provider = MagicMock()
+    intent_llm_provider.get_llm.return_value = GenericFakeChatModel(messages=iter([
+        AIMessage(content="health")
+    ]))
+
+    default_agent = MagicMock()
+
+    with patch('app.api.main.health_agent', default_agent), \
+         patch('app.api.main.get_agent_for_provider', return_value=graph) as get_agent, \
+         patch('app.agents.intent_classifier.llm_provider', intent_llm_provider):
+        response = TestClient(app).post("/chat/stream", json={
+            "message": "how many steps did I walk",
+            "session_id": "s1",
+            "provider": "ollama"
+        })
+
+    assert response.status_code == 200
+    get_agent.assert_called_once_with("ollama")
+    default_agent.chat_stream.assert_not_called()
+    assert response.text == "You walked 8,000 steps a day this week."
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,185 @@
+"""
+Tests for the combined daily metrics query, period bounds and tool input parsing.
+"""
+import json
+import sqlite3
+import threading
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app.core.health_data_service import HealthDataService, MAX_DAYS_BACK
+from app.core.health_tools import _parse_integer_from_input, get_health_dashboard_tool
+from app.ingestion.apple_health import AppleHealthParser
+
+DAYS_BACK_METHODS = [
+    "get_daily_steps",
+    "get_heart_rate_summary",
+    "get_weight_progress",
+    "get_activity_summary",
+    "get_all_daily_metrics",
+    "get_sleep_data",
+]
+
+
+def create_database(db_path):
+    """Create an empty database with the ingestion schema."""
+    AppleHealthParser("unused.xml", db_path=str(db_path)).create_database()
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Health service over two weeks of daily summaries, with gaps in every metric."""
+    db_path = tmp_path / "lifebuddy.db"
+    create_database(db_path)
+
+    today = date.today()
+    rows = []
+    for day in range(14):
+        rows.append((
+            (today - timedelta(days=day)).isoformat(),
+            None if day % 5 == 4 else 6000 + day * 250,           # steps
+            None if day % 3 == 2 else 60.0 + day,                 # avg_heart_rate
+            None if day % 3 == 2 else 48.0 + day,                 # min_heart_rate
+            None if day % 3 == 2 else 120.0 + day,                # max_heart_rate
+            80.0 - day * 0.1 if day % 4 == 0 else None,           # body_mass_kg
+            20.0 if day % 4 == 0 else None,                       # body_fat_percentage
+            None if day % 6 == 5 else 400.0 + day,                # active_energy_burned
+            30 + day,                                             # exercise_time_minutes
+            4.0 + day * 0.25,                                     # distance_walking_km
+        ))
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            """INSERT INTO daily_summaries (date, steps, avg_heart_rate, min_heart_rate,
+               max_heart_rate, body_mass_kg, body_fat_percentage, active_energy_burned,
+               exercise_time_minutes, distance_walking_km) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows
+        )
+    conn.close()
+
+    return HealthDataService(str(db_path))
+
+
+@pytest.fixture
+def empty_service(tmp_path):
+    """Health service over a database with no data."""
+    db_path = tmp_path / "empty.db"
+    create_database(db_path)
+    return HealthDataService(str(db_path))
+
+
+@pytest.mark.parametrize("days_back", [3, 7, 30])
+def test_all_daily_metrics_match_single_metric_methods(service, days_back):
+    """Each section of the combined result equals the matching single-metric method."""
+    combined = service.get_all_daily_metrics(days_back)
+
+    assert combined["period"] == f"Last {days_back} days"
+    assert combined["steps"] == service.get_daily_steps(days_back)
+    assert combined["heart_rate"] == service.get_heart_rate_summary(days_back)
+    assert combined["weight"] == service.get_weight_progress(days_back)
+    assert combined["activity"] == service.get_activity_summary(days_back)
+
+
+def test_all_daily_metrics_without_data(empty_service):
+    """Empty sections report the same messages as the single-metric methods."""
+    combined = empty_service.get_all_daily_metrics(7)
+
+    assert combined["steps"] == empty_service.get_daily_steps(7)
+    assert combined["heart_rate"] == empty_service.get_heart_rate_summary(7)
+    assert combined["weight"] == empty_service.get_weight_progress(7)
+    assert combined["activity"] == empty_service.get_activity_summary(7)
+
+
+@pytest.mark.parametrize("method_name", DAYS_BACK_METHODS)
+def test_negative_days_back_is_rejected(service, method_name):
+    """A negative period is rejected before any query runs, positionally or by keyword."""
+    method = getattr(service, method_name)
+
+    assert method(-1) == {"message": "Invalid period"}
+    assert method(days_back=-30) == {"message": "Invalid period"}
+
+
+@pytest.mark.parametrize("method_name", DAYS_BACK_METHODS)
+def test_days_back_is_capped(service, method_name):
+    """Periods beyond MAX_DAYS_BACK are served as MAX_DAYS_BACK."""
+    method = getattr(service, method_name)
+
+    assert method(MAX_DAYS_BACK * 10) == method(MAX_DAYS_BACK)
+
+
+def test_days_back_cap_is_reported_in_period(service):
+    """The capped period is what the result describes."""
+    assert service.get_daily_steps(100000)["period"] == f"Last {MAX_DAYS_BACK} days"
+
+
+def test_query_stream_releases_lock_between_rows(service):
+    """The service stays usable while a streamed query is being consumed."""
+    streamed = []
+
+    def consume():
+        with patch('app.core.health_data_service.STREAM_BATCH_SIZE', 5):
+            for row in service._execute_query_stream("SELECT date FROM daily_summaries ORDER BY date"):
+                service._execute_aggregate("SELECT COUNT(*) FROM daily_summaries")
+                streamed.append(row["date"])
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    consumer.join(timeout=5)
+
+    assert not consumer.is_alive()
+    assert len(streamed) == 14
+
+
+def test_health_dashboard_tool(service):
+    """The dashboard tool returns the timezone plus every combined metric section."""
+    with patch('app.core.health_tools.get_health_service', return_value=service):
+        dashboard = json.loads(get_health_dashboard_tool("'7'"))
+
+    expected = json.loads(json.dumps(service.get_all_daily_metrics(7), default=str))
+    assert dashboard["timezone"] == service.get_user_timezone_info()
+    for section in ("period", "steps", "heart_rate", "weight", "activity"):
+        assert dashboard[section] == expected[section]
+
+
+def test_health_dashboard_tool_error():
+    """Service failures come back as an error string rather than an exception."""
+    with patch('app.core.health_tools.get_health_service', side_effect=RuntimeError("db is gone")):
+        result = get_health_dashboard_tool("7")
+
+    assert result == "Error getting health dashboard: db is gone"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("7", 7),
+    (14, 14),
+    (" 21 ", 21),
+    ("'30'", 30),
+    ('"90"', 90),
+    ("\"'5'\"", 5),
+    ("last 10 days", 10),
+    # The sign is never part of the match; the magnitude is used
+    ("-5", 5),
+    (-3, 3),
+    # Underscore separators are not digit grouping here; the first digit run wins
+    ("1_000", 1),
+    ("'1_000'", 1),
+    # Nothing usable falls back to the default
+    ("", 7),
+    (None, 7),
+    (0, 7),
+    ("abc", 7),
+    ("''", 7),
+])
+def test_parse_integer_from_input(raw, expected):
+    """Tool arguments from small and native tool-calling models parse to a day count."""
+    assert _parse_integer_from_input(raw) == expected
+
+
+def test_parse_integer_from_input_custom_default():
+    """The caller's default is used when the input holds no integer."""
+    assert _parse_integer_from_input("none", 30) == 30
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])